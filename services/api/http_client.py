@@ -0,0 +1,91 @@
+##############################################################################
+# Shared HTTP Client
+##############################################################################
+# One pooled httpx.AsyncClient for the router's auth endpoints (token
+# introspection and exchange), so requests reuse kept-alive TLS connections
+# instead of opening a client, and a handshake, per call. post() also caps how
+# many auth calls a worker has in flight, so a burst of logins or refreshes
+# queues here instead of piling onto the router. Configured from the
+# environment:
+#
+#   AUTH_HTTP_CONNECT_TIMEOUT          seconds to establish a connection
+#   AUTH_HTTP_TIMEOUT                  seconds for reads, writes and pool waits
+#   AUTH_HTTP_MAX_CONNECTIONS          pooled connections per worker
+#   AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS  idle connections kept open
+#   AUTH_HTTP_MAX_CONCURRENCY          auth calls in flight at once per worker
+
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+
+AUTH_HTTP_CONNECT_TIMEOUT = float(os.getenv("AUTH_HTTP_CONNECT_TIMEOUT", 5))
+AUTH_HTTP_TIMEOUT = float(os.getenv("AUTH_HTTP_TIMEOUT", 20))
+AUTH_HTTP_MAX_CONNECTIONS = int(os.getenv("AUTH_HTTP_MAX_CONNECTIONS", 100))
+AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+AUTH_HTTP_MAX_CONCURRENCY = int(os.getenv("AUTH_HTTP_MAX_CONCURRENCY", 32))
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+# Only touched from the event loop thread, so no locking needed
+waiting = 0
+in_flight = 0
+
+
+def get_client() -> httpx.AsyncClient:
+    """The pooled client of the running event loop, created on first use"""
+    global _client, _client_loop, _semaphore
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _semaphore = asyncio.Semaphore(AUTH_HTTP_MAX_CONCURRENCY)
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(AUTH_HTTP_TIMEOUT, connect=AUTH_HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=AUTH_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    """POST through the pooled client once a concurrency slot is free"""
+    global waiting, in_flight
+    client = get_client()
+    waiting += 1
+    admitted = False
+    try:
+        async with _semaphore:
+            waiting -= 1
+            admitted = True
+            in_flight += 1
+            try:
+                return await client.post(url, **kwargs)
+            finally:
+                in_flight -= 1
+    finally:
+        # Cancelled while still queued for a slot
+        if not admitted:
+            waiting -= 1
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "max_concurrency": AUTH_HTTP_MAX_CONCURRENCY,
+        "waiting": waiting,
+        "in_flight": in_flight,
+    }
+
+
+async def aclose() -> None:
+    """Close pooled connections (call on application shutdown)"""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _client_loop = None
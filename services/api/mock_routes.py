@@ -10,7 +10,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import HTMLResponse, Response
 
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, Response
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.security import OAuth2PasswordBearer
 
@@ -50,7 +50,7 @@ REFRESH_TOKEN_COOKIE_NAME = "refresh_token"
 
 
 
-from .models import UploadAndProcessPdfOutputSchema, BodyPdfServiceGetDocument, GetDocumentOutputSchema, ListDocumentsOutputSchema, BodyChatServiceChatWithDocument, ChatWithDocumentOutputSchema, BodyChatServiceGetDocumentInfo, GetDocumentInfoOutputSchema, BodyShareServiceCreateShareableLink, CreateShareableLinkOutputSchema, BodyShareServiceGetDocumentByShareToken, GetDocumentByShareTokenOutputSchema, BodyShareServiceCreateChatSession, CreateChatSessionOutputSchema, BodyShareServiceGetChatSession, GetChatSessionOutputSchema, BodyShareServiceUpdateChatSessionActivity, BodyShareServiceRevokeShareAccess, RevokeShareAccessOutputSchema, BodySharedChatServiceChatWithSharedDocument, ChatWithSharedDocumentOutputSchema, BodySharedChatServiceGetSharedChatHistory, GetSharedChatHistoryOutputSchema
+from .models import UploadAndProcessPdfOutputSchema, BodyPdfServiceGetDocument, GetDocumentOutputSchema, BodyPdfServiceListDocuments, ListDocumentsOutputSchema, BodyPdfServiceListDocumentsPage, ListDocumentsPageOutputSchema, EnqueuePdfIngestionOutputSchema, BodyPdfServiceGetIngestionJob, GetIngestionJobOutputSchema, BodyChatServiceChatWithDocument, ChatWithDocumentOutputSchema, BodyChatServiceStreamChatWithDocument, BodyChatServiceGetDocumentInfo, GetDocumentInfoOutputSchema, BodyShareServiceCreateShareableLink, CreateShareableLinkOutputSchema, BodyShareServiceGetDocumentByShareToken, GetDocumentByShareTokenOutputSchema, BodyShareServiceCreateChatSession, CreateChatSessionOutputSchema, BodyShareServiceGetChatSession, GetChatSessionOutputSchema, BodyShareServiceUpdateChatSessionActivity, BodyShareServiceRevokeShareAccess, RevokeShareAccessOutputSchema, BodySharedChatServiceChatWithSharedDocument, ChatWithSharedDocumentOutputSchema, BodySharedChatServiceStreamChatWithSharedDocument, BodySharedChatServiceGetSharedChatHistory, GetSharedChatHistoryOutputSchema
 
 
 ###############################################################################
@@ -274,6 +274,14 @@ async def run_sync_in_thread(func: Callable[..., Any], *args, **kwargs) -> Any:
     )
 
 
+##############################################################################
+# Streaming Helpers
+##############################################################################
+
+# Documents streaming routes as Server-Sent Events rather than JSON
+EVENT_STREAM_RESPONSES = {200: {"content": {"text/event-stream": {}}, "description": "Server-Sent Events"}}
+
+
 ##############################################################################
 # Custom Docs
 ##############################################################################
@@ -505,9 +513,39 @@ async def pdf_service_get_document(body: BodyPdfServiceGetDocument = Body(...))
 
 
 @app.post('/api/pdf_service/list_documents', response_model=ListDocumentsOutputSchema, operation_id='pdf_service_list_documents')
-async def pdf_service_list_documents() -> ListDocumentsOutputSchema:
+async def pdf_service_list_documents(body: BodyPdfServiceListDocuments = Body(BodyPdfServiceListDocuments())) -> ListDocumentsOutputSchema:
+    """
+    List documents newest first with presigned URLs, one page at a time; pass the last document's id as cursor for the next page.
+    """
+    pass
+
+
+
+
+@app.post('/api/pdf_service/list_documents_page', response_model=ListDocumentsPageOutputSchema, operation_id='pdf_service_list_documents_page')
+async def pdf_service_list_documents_page(body: BodyPdfServiceListDocumentsPage = Body(...)) -> ListDocumentsPageOutputSchema:
+    """
+    List documents newest first, one page at a time, with only the requested fields (all by default).
+    """
+    pass
+
+
+
+
+@app.post('/api/pdf_service/enqueue_pdf_ingestion', response_model=EnqueuePdfIngestionOutputSchema, operation_id='pdf_service_enqueue_pdf_ingestion')
+async def pdf_service_enqueue_pdf_ingestion(pdf_file: UploadFile = File(...), title: str = Form(...)) -> EnqueuePdfIngestionOutputSchema:
+    """
+    Upload PDF file and queue it for background processing; poll get_ingestion_job for progress.
     """
-    List all documents with presigned URLs.
+    pass
+
+
+
+
+@app.post('/api/pdf_service/get_ingestion_job', response_model=GetIngestionJobOutputSchema, operation_id='pdf_service_get_ingestion_job')
+async def pdf_service_get_ingestion_job(body: BodyPdfServiceGetIngestionJob = Body(...)) -> GetIngestionJobOutputSchema:
+    """
+    Get the stage and progress counters of an ingestion job.
     """
     pass
 
@@ -524,6 +562,16 @@ async def chat_service_chat_with_document(body: BodyChatServiceChatWithDocument
 
 
 
+@app.post('/api/chat_service/stream_chat_with_document', response_class=StreamingResponse, responses=EVENT_STREAM_RESPONSES, operation_id='chat_service_stream_chat_with_document')
+async def chat_service_stream_chat_with_document(body: BodyChatServiceStreamChatWithDocument = Body(...)) -> StreamingResponse:
+    """
+    Chat with a document, streaming citations and then the answer as Server-Sent Events.
+    """
+    pass
+
+
+
+
 @app.post('/api/chat_service/get_document_info', response_model=GetDocumentInfoOutputSchema, operation_id='chat_service_get_document_info')
 async def chat_service_get_document_info(body: BodyChatServiceGetDocumentInfo = Body(...)) -> GetDocumentInfoOutputSchema:
     """
@@ -604,6 +652,16 @@ async def shared_chat_service_chat_with_shared_document(body: BodySharedChatServ
 
 
 
+@app.post('/api/shared_chat_service/stream_chat_with_shared_document', response_class=StreamingResponse, responses=EVENT_STREAM_RESPONSES, operation_id='shared_chat_service_stream_chat_with_shared_document')
+async def shared_chat_service_stream_chat_with_shared_document(body: BodySharedChatServiceStreamChatWithSharedDocument = Body(...)) -> StreamingResponse:
+    """
+    Chat with a shared document, streaming citations and then the answer as Server-Sent Events.
+    """
+    pass
+
+
+
+
 @app.post('/api/shared_chat_service/get_shared_chat_history', response_model=GetSharedChatHistoryOutputSchema, operation_id='shared_chat_service_get_shared_chat_history')
 async def shared_chat_service_get_shared_chat_history(body: BodySharedChatServiceGetSharedChatHistory = Body(...)) -> GetSharedChatHistoryOutputSchema:
     """
@@ -24,21 +24,41 @@ class LogoutResponse(BaseModel):
     success: bool = True
 
 # Import user-defined models that we need for input/response models
-from core.document import Document
+from core.document import Document, DocumentPage
 from core.chunk import Chunk
 from core.chat_session import ChatSession
+from core.ingestion_job import IngestionJob
 
 UploadAndProcessPdfOutputSchema = Document
 class BodyPdfServiceGetDocument(BaseModel):
   document_id: uuid.UUID
 
 GetDocumentOutputSchema = Document
+class BodyPdfServiceListDocuments(BaseModel):
+  cursor: Optional[uuid.UUID] = None
+  limit: Optional[int] = None
+
 ListDocumentsOutputSchema = List[Document]
+class BodyPdfServiceListDocumentsPage(BaseModel):
+  cursor: Optional[str] = None
+  limit: Optional[int] = None
+  fields: Optional[List[str]] = None
+
+ListDocumentsPageOutputSchema = DocumentPage
+EnqueuePdfIngestionOutputSchema = IngestionJob
+class BodyPdfServiceGetIngestionJob(BaseModel):
+  job_id: uuid.UUID
+
+GetIngestionJobOutputSchema = IngestionJob
 class BodyChatServiceChatWithDocument(BaseModel):
   messages: List[Dict[str, str]]
   document_id: uuid.UUID
 
 ChatWithDocumentOutputSchema = str
+class BodyChatServiceStreamChatWithDocument(BaseModel):
+  messages: List[Dict[str, str]]
+  document_id: uuid.UUID
+
 class BodyChatServiceGetDocumentInfo(BaseModel):
   document_id: uuid.UUID
 
@@ -71,6 +91,10 @@ class BodySharedChatServiceChatWithSharedDocument(BaseModel):
   message: str
 
 ChatWithSharedDocumentOutputSchema = Dict[str, Any]
+class BodySharedChatServiceStreamChatWithSharedDocument(BaseModel):
+  session_token: str
+  message: str
+
 class BodySharedChatServiceGetSharedChatHistory(BaseModel):
   session_token: str
 
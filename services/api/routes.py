@@ -10,34 +10,33 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import HTMLResponse, Response
 
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, Response
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.security import OAuth2PasswordBearer
 
 import sys
 import os
-import asyncio
 import logging
 import traceback
 import contextvars
-import httpx
 import jwt
 import json
-import requests
 from pathlib import Path
 import builtins
 
 from datetime import datetime, date, time, timedelta
-from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Any, TypeVar, Awaitable, List, Optional, Dict, Union, Literal, Annotated, Tuple, Set
-from functools import partial, wraps
+from functools import wraps
 from uuid import UUID
 import uuid
 
 from solar.access import User
-from solar.media import MediaFile
+from solar.table import close_async_pool
+from solar.media import MediaFile, close_client as close_media_client
 
 from api.utils import get_swagger_ui_html
+from api import http_client
+from api.token_cache import token_cache, TokenRejected
 from api.models import TokenExchangeRequest, TokenResponse, TokenValidationRequest, LogoutResponse
 
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
@@ -50,8 +49,8 @@ REFRESH_TOKEN_COOKIE_NAME = "refresh_token"
 
 
 
-from .models import UploadAndProcessPdfOutputSchema, BodyPdfServiceGetDocument, GetDocumentOutputSchema, ListDocumentsOutputSchema, BodyChatServiceChatWithDocument, ChatWithDocumentOutputSchema, BodyChatServiceGetDocumentInfo, GetDocumentInfoOutputSchema, BodyShareServiceCreateShareableLink, CreateShareableLinkOutputSchema, BodyShareServiceGetDocumentByShareToken, GetDocumentByShareTokenOutputSchema, BodyShareServiceCreateChatSession, CreateChatSessionOutputSchema, BodyShareServiceGetChatSession, GetChatSessionOutputSchema, BodyShareServiceUpdateChatSessionActivity, BodyShareServiceRevokeShareAccess, RevokeShareAccessOutputSchema, BodySharedChatServiceChatWithSharedDocument, ChatWithSharedDocumentOutputSchema, BodySharedChatServiceGetSharedChatHistory, GetSharedChatHistoryOutputSchema
-from core import pdf_service, chat_service, share_service, shared_chat_service
+from .models import UploadAndProcessPdfOutputSchema, BodyPdfServiceGetDocument, GetDocumentOutputSchema, BodyPdfServiceListDocuments, ListDocumentsOutputSchema, BodyPdfServiceListDocumentsPage, ListDocumentsPageOutputSchema, EnqueuePdfIngestionOutputSchema, BodyPdfServiceGetIngestionJob, GetIngestionJobOutputSchema, BodyChatServiceChatWithDocument, ChatWithDocumentOutputSchema, BodyChatServiceStreamChatWithDocument, BodyChatServiceGetDocumentInfo, GetDocumentInfoOutputSchema, BodyShareServiceCreateShareableLink, CreateShareableLinkOutputSchema, BodyShareServiceGetDocumentByShareToken, GetDocumentByShareTokenOutputSchema, BodyShareServiceCreateChatSession, CreateChatSessionOutputSchema, BodyShareServiceGetChatSession, GetChatSessionOutputSchema, BodyShareServiceUpdateChatSessionActivity, BodyShareServiceRevokeShareAccess, RevokeShareAccessOutputSchema, BodySharedChatServiceChatWithSharedDocument, ChatWithSharedDocumentOutputSchema, BodySharedChatServiceStreamChatWithSharedDocument, BodySharedChatServiceGetSharedChatHistory, GetSharedChatHistoryOutputSchema
+from core import pdf_service, chat_service, share_service, shared_chat_service, retrieval, lexical_index, ingestion_worker, answer_cache, semantic_cache, llm, executors
 
 
 ###############################################################################
@@ -59,9 +58,6 @@ from core import pdf_service, chat_service, share_service, shared_chat_service
 ###############################################################################
 import sys
 from loguru import logger
-from pathlib import Path
-from typing import TypeVar
-import traceback
 
 def format_record(record):
     fmt = "{level:<5} | {message}"
@@ -264,17 +260,92 @@ async def health_check():
 # Synchronous Function Helpers
 ##############################################################################
 
-thread_pool = ThreadPoolExecutor(max_workers=4)
-
 async def run_sync_in_thread(func: Callable[..., Any], *args, **kwargs) -> Any:
-    """Runs a synchronous function in a thread pool"""
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(
-        thread_pool,
-        partial(func, *args, **kwargs)
+    """Runs a synchronous function on the interactive executor lane"""
+    return await executors.interactive.run(func, *args, **kwargs)
+
+async def run_sync_in_bulk_thread(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs a long synchronous function (uploads, ingestion) on the bulk executor lane"""
+    return await executors.bulk.run(func, *args, **kwargs)
+
+
+##############################################################################
+# Streaming Helpers
+##############################################################################
+
+# Documents streaming routes as Server-Sent Events rather than JSON
+EVENT_STREAM_RESPONSES = {200: {"content": {"text/event-stream": {}}, "description": "Server-Sent Events"}}
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode one {"event", "data"} dict as a Server-Sent Event"""
+    return f"event: {event['event']}\ndata: {json.dumps(event.get('data', {}), default=str)}\n\n"
+
+def event_stream_response(events) -> StreamingResponse:
+    """Stream an async iterator of {"event", "data"} dicts to the client as Server-Sent Events"""
+    async def body():
+        async for event in events:
+            yield format_sse(event)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream or caching it
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+##############################################################################
+# Background Workers
+##############################################################################
+
+@app.on_event("startup")
+async def start_ingestion_workers():
+    """Start in-process ingestion queue workers (INGESTION_WORKERS)"""
+    ingestion_worker.start_workers()
+
+@app.on_event("shutdown")
+async def stop_ingestion_workers():
+    ingestion_worker.stop_workers()
+
+@app.on_event("shutdown")
+async def close_database_pools():
+    await close_async_pool()
+
+@app.on_event("shutdown")
+async def stop_executor_lanes():
+    executors.shutdown()
+
+@app.on_event("shutdown")
+async def close_llm_gateway():
+    await llm.aclose()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
+@app.on_event("shutdown")
+async def stop_media_credential_refresh():
+    close_media_client()
+
+
+##############################################################################
+# Metrics
+##############################################################################
+
+@app.get("/api/metrics", include_in_schema=False)
+async def metrics():
+    """Per-worker cache counters for sizing"""
+    return {
+        "retrieval_cache": retrieval.embedding_cache.stats(),
+        "lexical_cache": lexical_index.lexical_cache.stats(),
+        "answer_cache": answer_cache.cache.stats(),
+        "semantic_cache": semantic_cache.semantic_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "auth_http": http_client.stats(),
+        "executors": executors.stats(),
+    }
+
+
 ##############################################################################
 # Custom Docs
 ##############################################################################
@@ -315,22 +386,31 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             raise HTTPException(status_code=401, detail="Malformed token")
         
         token_url = f"{base_url}/innerApp/oauth2/introspect"
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            response = await client.post(token_url, json={"token": jti, "token_type_hint": "access_token"})
-            if response.status_code != 200:
+        
+        async def introspect() -> User:
+            response = await http_client.post(token_url, json={"token": jti, "token_type_hint": "access_token"})
+            if response.status_code >= 500 or response.status_code == 429:
+                # Router trouble says nothing about the token, so it isn't cached
                 raise HTTPException(status_code=401, detail="Unauthorized")
+            if response.status_code != 200:
+                raise TokenRejected("Unauthorized")
             
             json_response = response.json()
             if not json_response.get("active", False):
-                raise HTTPException(status_code=401, detail="Unauthorized")
+                raise TokenRejected("Unauthorized")
             
             user_uuid = json_response.get("userUuid")
             email = json_response.get("email")
             if not user_uuid or not email:
-                raise HTTPException(status_code=401, detail="Invalid user data")
+                raise TokenRejected("Invalid user data")
             
-            user = User(id=user_uuid, email=email)
-            return user
+            return User(id=user_uuid, email=email)
+        
+        # Recently verified (or rejected) tokens skip the introspection round trip
+        try:
+            return await token_cache.verify(jti, exp, introspect)
+        except TokenRejected as e:
+            raise HTTPException(status_code=401, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -383,13 +463,14 @@ async def exchange_token(request: Request, body: TokenExchangeRequest = Body(...
             except Exception as e:
                 logger.warning("Error extracting JTI from refresh token")
 
-        response = requests.post(
+        # Pooled async client, so a slow router doesn't block the event loop
+        response = await http_client.post(
             SOLAR_APP_TOKEN_URL,
             json=params,
             headers={"Content-Type": "application/json", "Accept": "application/json"}
         )
         
-        if not response.ok:
+        if not response.is_success:
             return JSONResponse(
                     status_code=401,
                     content={
@@ -497,7 +578,7 @@ async def pdf_service_upload_and_process_pdf(pdf_file: UploadFile = File(...), t
         file_size = len(contents)
         pdf_file = MediaFile(size=file_size, mime_type=content_type, bytes=contents)
 
-    response = await run_sync_in_thread(pdf_service.upload_and_process_pdf, pdf_file=pdf_file, title=title)
+    response = await run_sync_in_bulk_thread(pdf_service.upload_and_process_pdf, pdf_file=pdf_file, title=title)
     return response
     
     
@@ -519,11 +600,56 @@ async def pdf_service_get_document(body: BodyPdfServiceGetDocument = Body(...))
 
 
 @app.post('/api/pdf_service/list_documents', response_model=ListDocumentsOutputSchema, operation_id='pdf_service_list_documents')
-async def pdf_service_list_documents() -> ListDocumentsOutputSchema:
+async def pdf_service_list_documents(body: BodyPdfServiceListDocuments = Body(BodyPdfServiceListDocuments())) -> ListDocumentsOutputSchema:
     """
-    List all documents with presigned URLs.
+    List documents newest first with presigned URLs, one page at a time; pass the last document's id as cursor for the next page.
     """
-    response = await run_sync_in_thread(pdf_service.list_documents)
+    response = await run_sync_in_thread(pdf_service.list_documents, cursor=body.cursor, limit=body.limit)
+    return response
+    
+    
+
+
+
+
+@app.post('/api/pdf_service/list_documents_page', response_model=ListDocumentsPageOutputSchema, operation_id='pdf_service_list_documents_page')
+async def pdf_service_list_documents_page(body: BodyPdfServiceListDocumentsPage = Body(...)) -> ListDocumentsPageOutputSchema:
+    """
+    List documents newest first, one page at a time, with only the requested fields (all by default).
+    """
+    response = await run_sync_in_thread(pdf_service.list_documents_page, cursor=body.cursor, limit=body.limit, fields=body.fields)
+    return response
+    
+    
+
+
+
+@app.post('/api/pdf_service/enqueue_pdf_ingestion', response_model=EnqueuePdfIngestionOutputSchema, operation_id='pdf_service_enqueue_pdf_ingestion')
+async def pdf_service_enqueue_pdf_ingestion(pdf_file: UploadFile = File(...), title: str = Form(...)) -> EnqueuePdfIngestionOutputSchema:
+    """
+    Upload PDF file and queue it for background processing; poll get_ingestion_job for progress.
+    """
+    # Download pdf_file from the client
+    if pdf_file is not None:
+        content_type = pdf_file.content_type or "application/octet-stream"
+        contents = await pdf_file.read()
+        file_size = len(contents)
+        pdf_file = MediaFile(size=file_size, mime_type=content_type, bytes=contents)
+
+    response = await run_sync_in_bulk_thread(pdf_service.enqueue_pdf_ingestion, pdf_file=pdf_file, title=title)
+    return response
+    
+    
+
+
+
+
+@app.post('/api/pdf_service/get_ingestion_job', response_model=GetIngestionJobOutputSchema, operation_id='pdf_service_get_ingestion_job')
+async def pdf_service_get_ingestion_job(body: BodyPdfServiceGetIngestionJob = Body(...)) -> GetIngestionJobOutputSchema:
+    """
+    Get the stage and progress counters of an ingestion job.
+    """
+    response = await run_sync_in_thread(pdf_service.get_ingestion_job, job_id=body.job_id)
     return response
     
     
@@ -536,7 +662,7 @@ async def chat_service_chat_with_document(body: BodyChatServiceChatWithDocument
     """
     Chat with a document using RAG (Retrieval Augmented Generation).
     """
-    response = await run_sync_in_thread(chat_service.chat_with_document, messages=body.messages, document_id=body.document_id)
+    response = await chat_service.chat_with_document(messages=body.messages, document_id=body.document_id)
     return response
     
     
@@ -544,6 +670,19 @@ async def chat_service_chat_with_document(body: BodyChatServiceChatWithDocument
 
 
 
+@app.post('/api/chat_service/stream_chat_with_document', response_class=StreamingResponse, responses=EVENT_STREAM_RESPONSES, operation_id='chat_service_stream_chat_with_document')
+async def chat_service_stream_chat_with_document(body: BodyChatServiceStreamChatWithDocument = Body(...)) -> StreamingResponse:
+    """
+    Chat with a document, streaming citations and then the answer as Server-Sent Events.
+    """
+    events = await chat_service.stream_chat_with_document(messages=body.messages, document_id=body.document_id)
+    return event_stream_response(events)
+    
+    
+
+
+
+
 @app.post('/api/chat_service/get_document_info', response_model=GetDocumentInfoOutputSchema, operation_id='chat_service_get_document_info')
 async def chat_service_get_document_info(body: BodyChatServiceGetDocumentInfo = Body(...)) -> GetDocumentInfoOutputSchema:
     """
@@ -562,7 +701,7 @@ async def share_service_create_shareable_link(body: BodyShareServiceCreateSharea
     """
     Create a shareable link for a document.
     """
-    response = await run_sync_in_thread(share_service.create_shareable_link, document_id=body.document_id)
+    response = await share_service.create_shareable_link(document_id=body.document_id)
     return response
     
     
@@ -575,7 +714,7 @@ async def share_service_get_document_by_share_token(body: BodyShareServiceGetDoc
     """
     Get a document by its share token.
     """
-    response = await run_sync_in_thread(share_service.get_document_by_share_token, share_token=body.share_token)
+    response = await share_service.get_document_by_share_token(share_token=body.share_token)
     return response
     
     
@@ -588,7 +727,7 @@ async def share_service_create_chat_session(body: BodyShareServiceCreateChatSess
     """
     Create a new chat session for a document.
     """
-    response = await run_sync_in_thread(share_service.create_chat_session, document_id=body.document_id)
+    response = await share_service.create_chat_session(document_id=body.document_id)
     return response
     
     
@@ -601,7 +740,7 @@ async def share_service_get_chat_session(body: BodyShareServiceGetChatSession =
     """
     Get a chat session by its token.
     """
-    response = await run_sync_in_thread(share_service.get_chat_session, session_token=body.session_token)
+    response = await share_service.get_chat_session(session_token=body.session_token)
     return response
     
     
@@ -614,7 +753,7 @@ async def share_service_update_chat_session_activity(body: BodyShareServiceUpdat
     """
     Update the last activity timestamp for a chat session.
     """
-    await run_sync_in_thread(share_service.update_chat_session_activity, session_token=body.session_token)
+    await share_service.update_chat_session_activity(session_token=body.session_token)
     
     
 
@@ -626,7 +765,7 @@ async def share_service_revoke_share_access(body: BodyShareServiceRevokeShareAcc
     """
     Revoke public access to a document.
     """
-    response = await run_sync_in_thread(share_service.revoke_share_access, document_id=body.document_id)
+    response = await share_service.revoke_share_access(document_id=body.document_id)
     return response
     
     
@@ -639,7 +778,7 @@ async def shared_chat_service_chat_with_shared_document(body: BodySharedChatServ
     """
     Chat with a shared document using a session token.
     """
-    response = await run_sync_in_thread(shared_chat_service.chat_with_shared_document, session_token=body.session_token, message=body.message)
+    response = await shared_chat_service.chat_with_shared_document(session_token=body.session_token, message=body.message)
     return response
     
     
@@ -647,6 +786,19 @@ async def shared_chat_service_chat_with_shared_document(body: BodySharedChatServ
 
 
 
+@app.post('/api/shared_chat_service/stream_chat_with_shared_document', response_class=StreamingResponse, responses=EVENT_STREAM_RESPONSES, operation_id='shared_chat_service_stream_chat_with_shared_document')
+async def shared_chat_service_stream_chat_with_shared_document(body: BodySharedChatServiceStreamChatWithSharedDocument = Body(...)) -> StreamingResponse:
+    """
+    Chat with a shared document, streaming citations and then the answer as Server-Sent Events.
+    """
+    events = await shared_chat_service.stream_chat_with_shared_document(session_token=body.session_token, message=body.message)
+    return event_stream_response(events)
+    
+    
+
+
+
+
 @app.post('/api/shared_chat_service/get_shared_chat_history', response_model=GetSharedChatHistoryOutputSchema, operation_id='shared_chat_service_get_shared_chat_history')
 async def shared_chat_service_get_shared_chat_history(body: BodySharedChatServiceGetSharedChatHistory = Body(...)) -> GetSharedChatHistoryOutputSchema:
     """
@@ -0,0 +1,106 @@
+##############################################################################
+# Token Verification Cache
+##############################################################################
+# Introspection results keyed by the access token's jti, so an authenticated
+# request only reaches the router when its token hasn't been seen recently.
+#
+#   - Accepted tokens are kept for TOKEN_CACHE_TTL seconds, never past the
+#     token's exp.
+#   - Rejected tokens are kept for TOKEN_CACHE_NEGATIVE_TTL seconds, so a
+#     client retrying a revoked token doesn't cost an introspection each time.
+#     Transport errors and router 5xx are not cached.
+#   - Concurrent requests carrying the same uncached token share a single
+#     introspection call.
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from solar.cache import LRUCache
+
+
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", 300))
+TOKEN_CACHE_NEGATIVE_TTL = float(os.getenv("TOKEN_CACHE_NEGATIVE_TTL", 30))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", 10000))
+
+_MISSING = object()
+
+
+class TokenRejected(Exception):
+    """The router says the token is not valid; cached like an accepted result"""
+
+
+class TokenCache:
+    """Positive and negative introspection results with single-flight loading"""
+
+    def __init__(self, ttl: float, negative_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.results = LRUCache(max_entries=max_entries)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+        # Only touched from the event loop thread, so no locking needed
+        self.introspections = 0
+        self.coalesced = 0
+        self.rejections = 0
+
+    async def verify(self, jti: str, exp: Optional[float], introspect: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached result for jti, or run introspect() once for all concurrent callers.
+
+        introspect returns the verified user or raises TokenRejected; any other
+        exception propagates to every waiting caller without being cached.
+        """
+        cached = self.results.get(jti, _MISSING)
+        if isinstance(cached, TokenRejected):
+            raise TokenRejected(*cached.args)
+        if cached is not _MISSING:
+            return cached
+
+        task = self._in_flight.get(jti)
+        if task is None:
+            task = asyncio.ensure_future(self._introspect(jti, exp, introspect))
+            self._in_flight[jti] = task
+            task.add_done_callback(lambda done: self._finished(jti, done))
+        else:
+            self.coalesced += 1
+
+        # A caller that disconnects must not cancel the call others are waiting on
+        return await asyncio.shield(task)
+
+    async def _introspect(self, jti: str, exp: Optional[float], introspect: Callable[[], Awaitable[Any]]) -> Any:
+        self.introspections += 1
+        try:
+            result = await introspect()
+        except TokenRejected as e:
+            self.rejections += 1
+            self.results.set(jti, e, ttl=self.negative_ttl)
+            raise
+
+        ttl = self.ttl if exp is None else min(self.ttl, exp - time.time())
+        if ttl > 0:
+            self.results.set(jti, result, ttl=ttl)
+        return result
+
+    def _finished(self, jti: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(jti) is task:
+            del self._in_flight[jti]
+        # Mark the exception retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.results.stats(),
+            "introspections": self.introspections,
+            "coalesced": self.coalesced,
+            "rejections": self.rejections,
+            "in_flight": len(self._in_flight),
+        }
+
+
+token_cache = TokenCache(
+    ttl=TOKEN_CACHE_TTL,
+    negative_ttl=TOKEN_CACHE_NEGATIVE_TTL,
+    max_entries=TOKEN_CACHE_MAX_ENTRIES,
+)
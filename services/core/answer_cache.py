@@ -0,0 +1,104 @@
+from typing import Optional, Sequence, Tuple, Any
+from datetime import datetime, timedelta
+from solar.cache import LRUCache
+from core.cached_answer import CachedAnswer
+import hashlib
+import json
+import os
+import uuid
+
+# Seconds a cached answer stays valid
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 3600))
+
+# Per-process bounds of the in-memory tier
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 4096))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Also keep answers in Postgres so every worker (and restarts) can reuse them
+ANSWER_CACHE_PERSIST = os.getenv("ANSWER_CACHE_PERSIST", "false").lower() in ("1", "true", "yes")
+
+# In-memory tier, keyed by (document id, digest) so a document's entries can be dropped together
+cache = LRUCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    max_bytes=ANSWER_CACHE_MAX_BYTES,
+    ttl=ANSWER_CACHE_TTL,
+    sizeof=lambda answer: len(answer.encode("utf-8")),
+)
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivial variants share an entry."""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+def answer_key(document_id: uuid.UUID, question: str, chunk_ids: Sequence[Any], **model_params) -> Tuple[str, str]:
+    """Cache key for an answer: the document plus a digest of everything that shapes the completion.
+
+    The retrieved chunk ids are part of the digest, so answers built on chunks that were since
+    replaced can never be served, even by a worker that missed the invalidation.
+    """
+    payload = json.dumps(
+        {
+            "document_id": str(document_id),
+            "question": normalize_question(question),
+            "chunks": [str(chunk_id) for chunk_id in chunk_ids],
+            "model": model_params,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return str(document_id), hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get_answer(key: Tuple[str, str]) -> Optional[str]:
+    """Cached answer for key from memory, then from Postgres when persistence is enabled."""
+    answer = cache.get(key)
+    if answer is not None or not ANSWER_CACHE_PERSIST:
+        return answer
+
+    try:
+        results = CachedAnswer.select(
+            "answer", "expires_at",
+            where="key = %(key)s AND expires_at > %(now)s",
+            params={"key": key[1], "now": datetime.now()}
+        )
+    except Exception as e:
+        print(f"Could not read answer cache: {e}")
+        return None
+
+    if not results:
+        return None
+
+    # Promote into memory for the rest of its lifetime
+    remaining = (results[0]["expires_at"] - datetime.now()).total_seconds()
+    answer = results[0]["answer"]
+    cache.set(key, answer, ttl=max(remaining, 0))
+    return answer
+
+def store_answer(key: Tuple[str, str], answer: str) -> None:
+    """Cache a freshly generated answer in every enabled tier."""
+    cache.set(key, answer)
+    if not ANSWER_CACHE_PERSIST:
+        return
+
+    try:
+        CachedAnswer(
+            key=key[1],
+            document_id=key[0],
+            answer=answer,
+            expires_at=datetime.now() + timedelta(seconds=ANSWER_CACHE_TTL)
+        ).sync()
+    except Exception as e:
+        print(f"Could not write answer cache: {e}")
+
+def invalidate_document(document_id: uuid.UUID) -> None:
+    """Drop every cached answer for a document after its chunks changed."""
+    cache.pop_matching(lambda key: key[0] == str(document_id))
+    if not ANSWER_CACHE_PERSIST:
+        return
+
+    try:
+        CachedAnswer.sql(
+            "DELETE FROM cached_answers WHERE document_id = %(document_id)s",
+            {"document_id": str(document_id)}
+        )
+    except Exception as e:
+        # Stale rows can't be served anyway, their keys name chunks that no longer exist
+        print(f"Could not invalidate answer cache: {e}")
@@ -0,0 +1,13 @@
+from solar import Table, ColumnDetails
+from datetime import datetime
+import uuid
+
+class CachedAnswer(Table):
+    """Table backing the shared tier of the chat answer cache (see core.answer_cache)."""
+    __tablename__ = "cached_answers"
+    
+    key: str = ColumnDetails(primary_key=True)  # Digest of document, question, retrieved chunks and model parameters
+    document_id: uuid.UUID  # References Document.id, for invalidation
+    answer: str
+    created_at: datetime = ColumnDetails(default_factory=datetime.now)
+    expires_at: datetime
@@ -1,166 +1,290 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Any, AsyncIterator, Optional, Callable
 from solar.access import public
-from core.chunk import Chunk
+from core.chunk import Chunk, ChunkText
+from core.embedding import generate_embedding
 from core.document import Document
-from openai import OpenAI
+from core.retrieval import get_document_matrix, top_k_scores, normalize_scores
+from core import vector_store, answer_cache, lexical_index, fulltext, executors
+from core.semantic_cache import semantic_cache, SemanticHit
+from core.context_builder import pack_context, CONTEXT_CANDIDATES
+from core import llm
 import os
 import uuid
-import math
-
-# Initialize OpenAI client
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
-
-def cosine_similarity(a: List[float], b: List[float]) -> float:
-    """Calculate cosine similarity between two vectors."""
-    # Calculate dot product
-    dot_product = sum(x * y for x, y in zip(a, b))
-    
-    # Calculate magnitudes
-    magnitude_a = math.sqrt(sum(x * x for x in a))
-    magnitude_b = math.sqrt(sum(x * x for x in b))
-    
-    # Avoid division by zero
-    if magnitude_a == 0 or magnitude_b == 0:
-        return 0.0
-    
-    return dot_product / (magnitude_a * magnitude_b)
-
-def search_similar_chunks(query_embedding: List[float], document_id: uuid.UUID, top_k: int = 5) -> List[Chunk]:
-    """Find the most similar chunks to the query embedding."""
-    # Get all chunks for the document
-    results = Chunk.sql(
-        "SELECT * FROM chunks WHERE document_id = %(document_id)s",
-        {"document_id": str(document_id)}
-    )
+import numpy as np
+
+# Completion settings for document chat (also part of the answer cache key)
+CHAT_COMPLETION_PARAMS = {"model": "openai/gpt-4o-mini", "temperature": 0.1, "max_tokens": 1000}
+
+# "vector" ranks chunks by embedding similarity alone; "hybrid" adds BM25 keyword scores from the
+# in-process index (core.lexical_index); "fts" adds Postgres full-text ts_rank scores (core.fulltext)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+
+# Weight of the normalized vector score in hybrid and fts ranking (the keyword score gets the rest)
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", 0.5))
+
+# With pgvector, hybrid and fts ranking fuse this many candidates per top_k from each side
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR", 4))
+
+def fuse_scores(vector_scores: np.ndarray, lexical_scores: np.ndarray) -> np.ndarray:
+    """Weighted sum of min-max normalized vector and keyword scores."""
+    return HYBRID_VECTOR_WEIGHT * normalize_scores(vector_scores) + (1 - HYBRID_VECTOR_WEIGHT) * normalize_scores(lexical_scores)
+
+def keyword_candidates(query: str, document_id: uuid.UUID, limit: int) -> Tuple[Dict[str, float], Dict[str, Dict[str, Any]]]:
+    """Keyword scores of the best matching chunks by chunk id, plus any chunk rows the search already returned."""
+    if RETRIEVAL_MODE == "fts":
+        rows = {str(row["id"]): row for row in fulltext.search(query, document_id, limit)}
+        return {chunk_id: row["rank"] for chunk_id, row in rows.items()}, rows
+    return {str(chunk_id): score for chunk_id, score in lexical_index.get_index(document_id).top_k(query, limit)}, {}
+
+def hybrid_search_pgvector(query_embedding: List[float], query: str, document_id: uuid.UUID, top_k: int) -> List[ChunkText]:
+    """Fuse pgvector's and the keyword search's top candidates.
+    
+    Chunks only the keyword search found get the lowest vector score among the candidates.
+    """
+    candidates = top_k * HYBRID_CANDIDATE_FACTOR
+    rows = {str(row["id"]): row for row in vector_store.search(query_embedding, document_id, candidates)}
+    lexical, keyword_rows = keyword_candidates(query, document_id, candidates)
+    for chunk_id, row in keyword_rows.items():
+        rows.setdefault(chunk_id, row)
     
-    if not results:
+    # Fetch the keyword matches neither search returned rows for
+    missing = [chunk_id for chunk_id in lexical if chunk_id not in rows]
+    if missing:
+        for row in Chunk.select(
+            "id", "document_id", "page", "content",
+            where="id = ANY(%(ids)s::uuid[])",
+            params={"ids": missing}
+        ):
+            rows[str(row["id"])] = row
+    
+    if not rows:
         return []
     
-    # Calculate similarities
-    chunk_similarities = []
-    for result in results:
-        chunk = Chunk(**result)
-        similarity = cosine_similarity(query_embedding, chunk.embedding)
-        chunk_similarities.append((chunk, similarity))
-    
-    # Sort by similarity and return top k
-    chunk_similarities.sort(key=lambda x: x[1], reverse=True)
-    return [chunk for chunk, _ in chunk_similarities[:top_k]]
-
-def generate_embedding(text: str) -> List[float]:
-    """Generate embedding for text using hash-based approach as fallback."""
-    import hashlib
-    import struct
-    
-    # Fallback hash-based embedding since OpenRouter doesn't have embedding models readily available
-    dimension = 1536
-    embeddings = []
-    
-    # Normalize text
-    text = text.lower().strip()
-    
-    # Create embeddings by hashing text with different seeds
-    for i in range(dimension // 32):  # 32 values per hash
-        salted_text = f"{text}_{i}".encode('utf-8')
-        hash_obj = hashlib.sha256(salted_text)
-        hash_bytes = hash_obj.digest()
-        
-        # Convert bytes to floats
-        for j in range(0, len(hash_bytes), 8):
-            if len(embeddings) >= dimension:
-                break
-            chunk = hash_bytes[j:j+8]
-            if len(chunk) == 8:
-                # Convert to signed integer then normalize to [-1, 1]
-                val = struct.unpack('q', chunk)[0]
-                normalized = val / (2**63 - 1)  # Normalize to [-1, 1]
-                embeddings.append(float(normalized))
-    
-    # Pad or trim to exact dimension
-    while len(embeddings) < dimension:
-        embeddings.append(0.0)
-    
-    return embeddings[:dimension]
+    ids = list(rows)
+    similarities = [rows[chunk_id].get("similarity") for chunk_id in ids]
+    floor = min((s for s in similarities if s is not None), default=0.0)
+    vector_scores = np.array([floor if s is None else s for s in similarities], dtype=np.float32)
+    lexical_scores = np.array([lexical.get(chunk_id, 0.0) for chunk_id in ids], dtype=np.float32)
+    
+    return [ChunkText(**rows[ids[i]]) for i, _ in top_k_scores(fuse_scores(vector_scores, lexical_scores), top_k)]
+
+def search_similar_chunks(query_embedding: List[float], document_id: uuid.UUID, top_k: int = 5, query: Optional[str] = None) -> List[ChunkText]:
+    """Find the most similar chunks to the query embedding (and, in hybrid or fts mode, the query text)."""
+    hybrid = RETRIEVAL_MODE in ("hybrid", "fts") and bool(query)
+    
+    if vector_store.PGVECTOR_ENABLED:
+        if hybrid:
+            return hybrid_search_pgvector(query_embedding, query, document_id, top_k)
+        # Let Postgres rank with the ANN index instead of loading every embedding
+        return [ChunkText(**row) for row in vector_store.search(query_embedding, document_id, top_k)]
+    
+    # Get the document's embedding matrix (cached per process)
+    matrix = get_document_matrix(document_id)
+    
+    if not len(matrix):
+        return []
+    
+    if not hybrid:
+        # Score every chunk with one matrix-vector product and keep the top k
+        return [matrix.chunk(i) for i, _ in matrix.top_k(query_embedding, top_k)]
+    
+    # Keyword scores of every matching chunk, moved onto matrix rows
+    lexical, _ = keyword_candidates(query, document_id, len(matrix))
+    lexical_scores = np.zeros(len(matrix), dtype=np.float32)
+    for chunk_id, score in lexical.items():
+        row = matrix.position(chunk_id)
+        if row >= 0:
+            lexical_scores[row] = score
+    
+    fused = fuse_scores(matrix.scores(query_embedding), lexical_scores)
+    return [matrix.chunk(i) for i, _ in top_k_scores(fused, top_k)]
+
+def latest_user_message(messages: List[Dict[str, str]]) -> Optional[str]:
+    """Content of the last user message, if any."""
+    for message in reversed(messages):
+        if message.get('role') == 'user':
+            return message.get('content', '')
+    return None
+
+def build_chat_messages(user_message: str, chunks: List[ChunkText]) -> List[Dict[str, str]]:
+    """System prompt with the retrieved context, followed by the user's question."""
+    # Build context from similar chunks
+    context_parts = []
+    for chunk in chunks:
+        context_parts.append(f"[Page {chunk.page}] {chunk.content}")
+    
+    context = "\n\n".join(context_parts)
+    
+    # Build the system prompt
+    system_prompt = f"""You are an AI assistant that answers questions based ONLY on the provided document context. 
+
+Rules:
+1. Only answer questions using information from the provided context
+2. If the context doesn't contain enough information to answer the question, say so
+3. Always cite the page number(s) where you found the information (e.g., "According to page 5..." or "(p. 12)")
+4. Do not make up information or use knowledge outside of the provided context
+5. Be concise and helpful
+
+Context from the document:
+{context}"""
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message}
+    ]
+
+def citations(chunks: List[ChunkText]) -> Dict[str, Any]:
+    """Pages and chunk ids an answer draws on, sent to streaming clients before the answer itself."""
+    return {
+        "pages": sorted({chunk.page for chunk in chunks}),
+        "chunks": [{"id": str(chunk.id), "page": chunk.page} for chunk in chunks]
+    }
+
+async def stream_answer(
+    chunks: List[ChunkText],
+    messages: List[Dict[str, str]],
+    error_message: str,
+    on_complete: Optional[Callable[[str], None]] = None,
+    **completion_params
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield a citations event, then the completion's text deltas as they arrive, then done.
+    
+    Events are dicts with "event" (citations, delta, done or error) and "data". A failure mid-stream
+    becomes an error event carrying error_message, since the response has already started.
+    on_complete, when given, receives the full answer (on the interactive executor lane) once the stream finished without errors.
+    """
+    yield {"event": "citations", "data": citations(chunks)}
+    parts = []
+    try:
+        async for delta in llm.stream(messages, **completion_params):
+            parts.append(delta)
+            yield {"event": "delta", "data": {"content": delta}}
+    except Exception as e:
+        print(f"Error in streamed chat completion: {e}")
+        yield {"event": "error", "data": {"message": error_message}}
+        return
+    if on_complete is not None:
+        await executors.interactive.run(on_complete, "".join(parts))
+    yield {"event": "done", "data": {}}
+
+async def cached_answer_events(citation_data: Dict[str, Any], answer: str) -> AsyncIterator[Dict[str, Any]]:
+    """A cached answer as a stream: citations, the whole answer as one delta, then done."""
+    yield {"event": "citations", "data": citation_data}
+    async for event in message_events(answer):
+        yield event
+
+def recall_or_retrieve(document_id: uuid.UUID, user_message: str) -> Tuple[List[float], Optional[SemanticHit], List[ChunkText]]:
+    """Embed the question, then check the semantic cache before retrieving chunks.
+    
+    Returns (query embedding, semantic hit to serve or None, retrieved chunks). Unsampled hits skip
+    retrieval entirely, so their chunk list is empty.
+    """
+    query_embedding = generate_embedding(user_message)
+    
+    # A paraphrase of an earlier question reuses its answer without retrieval
+    hit = semantic_cache.lookup(document_id, query_embedding)
+    if hit is not None and not hit.sampled:
+        return query_embedding, hit, []
+    
+    # Retrieve a few extra candidates and keep what fits the context token budget
+    similar_chunks = pack_context(search_similar_chunks(query_embedding, document_id, top_k=CONTEXT_CANDIDATES, query=user_message))
+    
+    # Sampled hits are only served when a fresh retrieval agrees with them
+    if hit is not None and not semantic_cache.verify(hit, [chunk.id for chunk in similar_chunks]):
+        hit = None
+    return query_embedding, hit, similar_chunks
+
+def remember_answer(document_id: uuid.UUID, query_embedding: List[float], chunks: List[ChunkText], cache_key: Tuple[str, str], answer: str) -> None:
+    """Store a generated answer in the exact and semantic caches."""
+    answer_cache.store_answer(cache_key, answer)
+    # Only document chat feeds the semantic cache, so its entries all share CHAT_COMPLETION_PARAMS
+    semantic_cache.store(document_id, query_embedding, answer, [chunk.id for chunk in chunks], citations(chunks))
+
+async def message_events(content: str) -> AsyncIterator[Dict[str, Any]]:
+    """A fixed reply as a stream: one delta, then done."""
+    yield {"event": "delta", "data": {"content": content}}
+    yield {"event": "done", "data": {}}
 
 @public
-def chat_with_document(messages: List[Dict[str, str]], document_id: uuid.UUID) -> str:
+async def chat_with_document(messages: List[Dict[str, str]], document_id: uuid.UUID) -> str:
     """Chat with a document using RAG (Retrieval Augmented Generation)."""
     try:
         # Get the latest user message
-        user_message = None
-        for message in reversed(messages):
-            if message.get('role') == 'user':
-                user_message = message.get('content', '')
-                break
+        user_message = latest_user_message(messages)
         
         if not user_message:
             return "I need a question to answer."
         
-        # Generate embedding for the user's question
-        query_embedding = generate_embedding(user_message)
-        
-        # Search for similar chunks
-        similar_chunks = search_similar_chunks(query_embedding, document_id)
+        # Embed the question and search for similar chunks, unless a similar question was answered already
+        # (blocking database and numpy work runs on the interactive executor lane)
+        query_embedding, hit, similar_chunks = await executors.interactive.run(recall_or_retrieve, document_id, user_message)
+        if hit is not None:
+            return hit.answer
         
         if not similar_chunks:
             return "I couldn't find any relevant information in the document to answer your question."
         
-        # Build context from similar chunks
-        context_parts = []
-        for chunk in similar_chunks:
-            context_parts.append(f"[Page {chunk.page}] {chunk.content}")
-        
-        context = "\n\n".join(context_parts)
-        
-        # Build the system prompt
-        system_prompt = f"""You are an AI assistant that answers questions based ONLY on the provided document context. 
-
-Rules:
-1. Only answer questions using information from the provided context
-2. If the context doesn't contain enough information to answer the question, say so
-3. Always cite the page number(s) where you found the information (e.g., "According to page 5..." or "(p. 12)")
-4. Do not make up information or use knowledge outside of the provided context
-5. Be concise and helpful
-
-Context from the document:
-{context}"""
-        
-        # Prepare messages for the chat completion
-        chat_messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ]
+        # Repeated questions over the same chunks reuse the earlier answer
+        cache_key = answer_cache.answer_key(document_id, user_message, [chunk.id for chunk in similar_chunks], **CHAT_COMPLETION_PARAMS)
+        cached = await executors.interactive.run(answer_cache.get_answer, cache_key)
+        if cached is not None:
+            return cached
         
         # Generate response
-        response = client.chat.completions.create(
-            model="openai/gpt-4o-mini",
-            messages=chat_messages,
-            temperature=0.1,
-            max_tokens=1000
-        )
+        answer = await llm.complete(build_chat_messages(user_message, similar_chunks), **CHAT_COMPLETION_PARAMS)
         
-        return response.choices[0].message.content
+        await executors.interactive.run(remember_answer, document_id, query_embedding, similar_chunks, cache_key, answer)
+        return answer
         
     except Exception as e:
         return f"Sorry, I encountered an error while processing your question: {str(e)}"
 
+@public
+async def stream_chat_with_document(messages: List[Dict[str, str]], document_id: uuid.UUID) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming chat_with_document: retrieval runs now, the returned events carry citations and then the answer."""
+    # Get the latest user message
+    user_message = latest_user_message(messages)
+    
+    if not user_message:
+        return message_events("I need a question to answer.")
+    
+    # Retrieval happens before the response starts so failures still surface as errors
+    query_embedding, hit, similar_chunks = await executors.interactive.run(recall_or_retrieve, document_id, user_message)
+    if hit is not None:
+        return cached_answer_events(hit.citations, hit.answer)
+    
+    if not similar_chunks:
+        return message_events("I couldn't find any relevant information in the document to answer your question.")
+    
+    cache_key = answer_cache.answer_key(document_id, user_message, [chunk.id for chunk in similar_chunks], **CHAT_COMPLETION_PARAMS)
+    cached = await executors.interactive.run(answer_cache.get_answer, cache_key)
+    if cached is not None:
+        return cached_answer_events(citations(similar_chunks), cached)
+    
+    return stream_answer(
+        similar_chunks,
+        build_chat_messages(user_message, similar_chunks),
+        "Sorry, I encountered an error while processing your question.",
+        on_complete=lambda answer: remember_answer(document_id, query_embedding, similar_chunks, cache_key, answer),
+        **CHAT_COMPLETION_PARAMS
+    )
+
 @public
 def get_document_info(document_id: uuid.UUID) -> Dict[str, str]:
     """Get basic information about a document for the chat interface."""
     try:
         # Get document
-        doc_results = Document.sql(
-            "SELECT * FROM documents WHERE id = %(document_id)s",
-            {"document_id": str(document_id)}
+        doc_results = Document.select(
+            "title", "created_at",
+            where="id = %(document_id)s",
+            params={"document_id": str(document_id)},
+            as_model=True
         )
         
         if not doc_results:
             raise Exception(f"Document with ID {document_id} not found")
         
-        document = Document(**doc_results[0])
+        document = doc_results[0]
         
         # Get chunk count
         chunk_results = Chunk.sql(
@@ -1,15 +1,36 @@
-from solar import Table, ColumnDetails
-from typing import List, Optional
+from solar import Table, ColumnDetails, encode_embedding, decode_embedding
+from pydantic import field_validator
 from datetime import datetime
+import numpy as np
+import os
 import uuid
 
+EMBEDDING_DIMENSION = 1536
+EMBEDDING_CODEC = os.getenv("EMBEDDING_CODEC", "float32")  # "float32" or "int8" (quantized with a scale)
+
 class Chunk(Table):
     """Table for storing document chunks with embeddings for vector search."""
     __tablename__ = "chunks"
-    
+
     id: uuid.UUID = ColumnDetails(default_factory=uuid.uuid4, primary_key=True)
     document_id: uuid.UUID  # Foreign key to documents table
     content: str  # The actual text content of the chunk
     page: int  # Page number this chunk appears on
-    embedding: List[float]  # Vector embedding (1536 dimensions using hash-based approach)
-    created_at: datetime = ColumnDetails(default_factory=datetime.now)
\ No newline at end of file
+    embedding: bytes  # Packed vector embedding (1536 dimensions, see solar.table.encode_embedding)
+    created_at: datetime = ColumnDetails(default_factory=datetime.now)
+
+    @field_validator("embedding", mode="before")
+    @classmethod
+    def pack_embedding(cls, value):
+        """Accept float lists or arrays and store them packed."""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return encode_embedding(value, EMBEDDING_CODEC)
+
+    @property
+    def vector(self) -> np.ndarray:
+        """The embedding decoded into a float32 vector."""
+        return decode_embedding(self.embedding, EMBEDDING_DIMENSION)
+
+# A chunk without its embedding, for callers that only need the text and where it came from
+ChunkText = Chunk.projection("id", "document_id", "page", "content")
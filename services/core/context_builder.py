@@ -0,0 +1,103 @@
+from typing import List, Optional, Sequence, Set, Tuple
+from core.chunk import ChunkText
+import math
+import os
+import re
+
+# Prompt tokens available for retrieved context
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 2000))
+
+# Chunks retrieved as candidates before packing (best first)
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", 8))
+
+# Word-shingle Jaccard similarity above which a lower-ranked passage is dropped as a near duplicate
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.8))
+
+# Encoding used for local token counts when tiktoken is installed
+CONTEXT_TOKEN_ENCODING = os.getenv("CONTEXT_TOKEN_ENCODING", "o200k_base")
+
+# Fallback estimate when tiktoken is unavailable (English averages about four characters per token)
+CHARS_PER_TOKEN = 4
+
+SHINGLE_SIZE = 3
+
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    """tiktoken encoding, or None when tiktoken (or its encoding file) isn't available."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(CONTEXT_TOKEN_ENCODING)
+        except Exception as e:
+            print(f"tiktoken unavailable, estimating token counts: {e}")
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally, exactly with tiktoken or approximately from the text length."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens, preferring a word boundary."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        truncated = encoding.decode(tokens[:max_tokens])
+    else:
+        if len(text) <= max_tokens * CHARS_PER_TOKEN:
+            return text
+        truncated = text[:max_tokens * CHARS_PER_TOKEN]
+    return truncated.rsplit(" ", 1)[0] if " " in truncated else truncated
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def _jaccard(a: Set, b: Set) -> float:
+    union = a | b
+    return len(a & b) / len(union) if union else 1.0
+
+def pack_context(chunks: Sequence[ChunkText], token_budget: Optional[int] = None) -> List[ChunkText]:
+    """Pick chunks best-first into a token budget, skipping near duplicates, in a stable prompt order.
+
+    chunks must be ordered best first. The result is ordered by page (then chunk id) rather than by
+    score, so the same set of chunks always renders the same prompt prefix and the upstream prompt
+    cache can reuse it across questions.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    selected: List[ChunkText] = []
+    selected_shingles: List[Set] = []
+    used = 0
+
+    for chunk in chunks:
+        shingles = _shingles(chunk.content)
+        if any(_jaccard(shingles, other) >= CONTEXT_DUPLICATE_THRESHOLD for other in selected_shingles):
+            continue
+
+        tokens = count_tokens(chunk.content)
+        if used + tokens > budget:
+            if selected:
+                # Lower-ranked chunks may still fit in what is left
+                continue
+            # Always keep the best chunk, cut down to the budget
+            chunk = chunk.model_copy(update={"content": truncate_to_tokens(chunk.content, budget)})
+            tokens = count_tokens(chunk.content)
+
+        selected.append(chunk)
+        selected_shingles.append(shingles)
+        used += tokens
+
+    return sorted(selected, key=lambda chunk: (chunk.page, str(chunk.id)))
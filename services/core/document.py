@@ -1,5 +1,6 @@
 from solar import Table, ColumnDetails
-from typing import Optional
+from pydantic import BaseModel
+from typing import Optional, List
 from datetime import datetime
 import uuid
 
@@ -13,4 +14,21 @@ class Document(Table):
     pdf_url: Optional[str] = None  # Presigned URL for frontend access (overridden at runtime)
     created_at: datetime = ColumnDetails(default_factory=datetime.now)
     is_public: Optional[bool] = None  # Whether document can be accessed via shareable link (backwards compatibility)
-    share_token: Optional[str] = None  # Unique token for public sharing (backwards compatibility)
\ No newline at end of file
+    share_token: Optional[str] = None  # Unique token for public sharing (backwards compatibility)
+
+
+class DocumentSummary(BaseModel):
+    """A document in a list page; fields the caller didn't ask for are left as None."""
+    id: uuid.UUID
+    created_at: datetime
+    title: Optional[str] = None
+    pdf_path: Optional[str] = None
+    pdf_url: Optional[str] = None
+    is_public: Optional[bool] = None
+    share_token: Optional[str] = None
+
+
+class DocumentPage(BaseModel):
+    """One page of documents, newest first."""
+    documents: List[DocumentSummary]
+    next_cursor: Optional[str] = None  # Pass back to fetch the next page; None on the last page
@@ -0,0 +1,12 @@
+from solar import Table, ColumnDetails
+from datetime import datetime
+import uuid
+
+class DocumentIndex(Table):
+    """Table for storing each document's serialized BM25 inverted index (see core.lexical_index)."""
+    __tablename__ = "document_indexes"
+    
+    document_id: uuid.UUID = ColumnDetails(primary_key=True)  # References Document.id
+    chunk_count: int  # Chunks covered by the index
+    data: bytes  # Compressed postings, see LexicalIndex.to_bytes
+    created_at: datetime = ColumnDetails(default_factory=datetime.now)
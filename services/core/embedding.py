@@ -0,0 +1,52 @@
+from typing import List, Sequence
+from core.chunk import EMBEDDING_DIMENSION
+import hashlib
+import numpy as np
+
+# Hash-based fallback embedding, since OpenRouter doesn't have embedding models readily available.
+# Each text gets 48 salted SHA-256 digests; every digest yields four int64 values scaled into [-1, 1],
+# so the first 192 dimensions carry the hash and the rest stay zero.
+HASH_ROUNDS = EMBEDDING_DIMENSION // 32
+HASHED_DIMENSIONS = HASH_ROUNDS * 4
+
+def _digest(text: str) -> bytes:
+    """All salted digests for one text, concatenated."""
+    # The text is hashed once; each salt only finalizes a copy of that state
+    base = hashlib.sha256(text.lower().strip().encode("utf-8"))
+    digests = []
+    for i in range(HASH_ROUNDS):
+        salted = base.copy()
+        salted.update(f"_{i}".encode("utf-8"))
+        digests.append(salted.digest())
+    return b"".join(digests)
+
+def _scale(values: np.ndarray) -> np.ndarray:
+    """Map int64 values to float64 exactly like Python's int / (2**63 - 1)."""
+    # Work on magnitudes as uint64 so -2**63 is representable
+    negative = values < 0
+    raw = values.view(np.uint64)
+    magnitude = np.where(negative, ~raw + np.uint64(1), raw)
+
+    # The exact quotient is a hair above magnitude / 2**63, so Python's correctly rounded
+    # division only differs from the float64 cast at exact ties, where it rounds up
+    rounded = magnitude.astype(np.float64)
+    below = (magnitude - rounded.astype(np.uint64)).view(np.int64)
+    tie = (below > 0) & (2 * below == np.spacing(rounded))
+    rounded[tie] = np.nextafter(rounded[tie], np.inf)
+
+    return np.where(negative, -rounded, rounded) * 2.0 ** -63
+
+def embed_many(texts: Sequence[str]) -> np.ndarray:
+    """Embed a batch of texts into a (len(texts), 1536) float64 array."""
+    embeddings = np.zeros((len(texts), EMBEDDING_DIMENSION), dtype=np.float64)
+    if not texts:
+        return embeddings
+
+    # Decode every digest of the batch with one frombuffer (little-endian, as struct's native 'q' on our hosts)
+    raw = np.frombuffer(b"".join(_digest(text) for text in texts), dtype="<i8")
+    embeddings[:, :HASHED_DIMENSIONS] = _scale(raw.reshape(len(texts), HASHED_DIMENSIONS))
+    return embeddings
+
+def generate_embedding(text: str) -> List[float]:
+    """Generate embedding for text using hash-based approach as fallback."""
+    return embed_many([text])[0].tolist()
@@ -0,0 +1,118 @@
+##############################################################################
+# Executor Lanes
+##############################################################################
+# Blocking core functions run on named thread pools ("lanes") so that slow
+# bulk work such as PDF uploads cannot occupy the threads that quick,
+# interactive lookups (chat, share tokens, document info) need. Each lane has
+# its own size and concurrency limit, configured from the environment:
+#
+#   EXECUTOR_<LANE>_WORKERS       threads in the lane's pool
+#   EXECUTOR_<LANE>_CONCURRENCY   calls admitted at once (the rest wait)
+
+import asyncio
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+
+class ExecutorLane:
+    """A thread pool with an admission limit and queue-depth / wait-time counters"""
+
+    def __init__(self, name: str, max_workers: int, max_concurrency: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_concurrency = min(max_concurrency, max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-lane")
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        # Only touched from the event loop thread, so no locking needed
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a synchronous function on this lane once a concurrency slot is free"""
+        queued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        wait = time.monotonic() - queued_at
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.running += 1
+
+        # The slot is freed when the thread finishes, not when the caller stops waiting: a cancelled
+        # caller (e.g. a disconnected client) leaves the call running, and it still counts against the limit
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.executor.submit(partial(func, *args, **kwargs))
+        except BaseException:
+            self._finish(failed=True)
+            raise
+
+        def on_done(done: Future) -> None:
+            failed = done.cancelled() or done.exception() is not None
+            try:
+                loop.call_soon_threadsafe(partial(self._finish, failed=failed))
+            except RuntimeError:
+                pass  # Event loop already closed at shutdown
+
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def _finish(self, failed: bool) -> None:
+        """Count a finished call and free its slot (on the event loop thread)"""
+        self.running -= 1
+        if failed:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.completed + self.failed + self.running
+        return {
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(1000 * self.total_wait / started, 3) if started else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait, 3),
+        }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _lane_from_env(name: str, default_workers: int) -> ExecutorLane:
+    workers = int(os.getenv(f"EXECUTOR_{name.upper()}_WORKERS", default_workers))
+    concurrency = int(os.getenv(f"EXECUTOR_{name.upper()}_CONCURRENCY", workers))
+    return ExecutorLane(name, workers, concurrency)
+
+
+# Quick request/response work: chat, lookups, listings
+interactive = _lane_from_env("interactive", 10)  # Matches the sync database pool size
+
+# Long-running work: PDF uploads and synchronous ingestion
+bulk = _lane_from_env("bulk", 2)
+
+lanes: Dict[str, ExecutorLane] = {lane.name: lane for lane in (interactive, bulk)}
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {name: lane.stats() for name, lane in lanes.items()}
+
+
+def shutdown() -> None:
+    for lane in lanes.values():
+        lane.shutdown()
@@ -0,0 +1,38 @@
+from typing import List, Dict, Any, Optional
+from core.chunk import Chunk
+import os
+import uuid
+
+# Text search configuration for the generated tsvector column and for parsing queries
+FULLTEXT_CONFIG = os.getenv("FULLTEXT_CONFIG", "english")
+
+def ensure_column() -> None:
+    """Add the generated tsvector column on chunks; Postgres fills it for existing and newly inserted rows."""
+    Chunk.sql(
+        "ALTER TABLE chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{FULLTEXT_CONFIG}', content)) STORED"
+    )
+
+def ensure_index() -> None:
+    """Create the GIN index on the tsvector column, and the document_id index the per-document filter uses."""
+    Chunk.sql("CREATE INDEX IF NOT EXISTS chunks_content_tsv_idx ON chunks USING gin (content_tsv)")
+    Chunk.sql("CREATE INDEX IF NOT EXISTS chunks_document_id_idx ON chunks (document_id)")
+
+def search(query: str, document_id: Optional[uuid.UUID] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+    """Return the top_k chunk rows (without embeddings) matching the query by ts_rank, within one document or across all of them."""
+    params = {"query": query, "top_k": top_k}
+    where = ""
+    if document_id is not None:
+        where = "AND document_id = %(document_id)s"
+        params["document_id"] = str(document_id)
+    
+    return Chunk.sql(
+        f"""
+        SELECT id, document_id, content, page, ts_rank(content_tsv, query) AS rank
+        FROM chunks, plainto_tsquery('{FULLTEXT_CONFIG}', %(query)s) AS query
+        WHERE content_tsv @@ query {where}
+        ORDER BY rank DESC
+        LIMIT %(top_k)s
+        """,
+        params
+    )
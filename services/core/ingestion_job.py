@@ -0,0 +1,20 @@
+from solar import Table, ColumnDetails
+from typing import Optional
+from datetime import datetime
+import uuid
+
+class IngestionJob(Table):
+    """Table used as the queue of PDF ingestion jobs, with per-stage progress."""
+    __tablename__ = "ingestion_jobs"
+    
+    id: uuid.UUID = ColumnDetails(default_factory=uuid.uuid4, primary_key=True)
+    document_id: uuid.UUID  # References Document.id
+    pdf_path: str  # Path to the uploaded PDF in media bucket
+    stage: str = "queued"  # queued, extracting, embedding, writing, done or failed
+    pages_extracted: int = 0
+    chunks_embedded: int = 0
+    rows_written: int = 0
+    attempts: int = 0  # Times a worker has claimed this job
+    error: Optional[str] = None
+    created_at: datetime = ColumnDetails(default_factory=datetime.now)
+    updated_at: datetime = ColumnDetails(default_factory=datetime.now)  # Doubles as the worker heartbeat
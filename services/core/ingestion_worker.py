@@ -0,0 +1,154 @@
+from typing import Optional, List
+from datetime import datetime, timedelta
+from solar.media import get_from_bucket
+from core.chunk import Chunk
+from core.ingestion_job import IngestionJob
+from core.pdf_service import ingest_document
+import os
+import threading
+import uuid
+
+# Worker threads started inside each API process (0 leaves ingestion to ingest_worker.py processes)
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", 1))
+
+# Seconds an idle worker waits before polling the queue again
+INGESTION_POLL_INTERVAL = float(os.getenv("INGESTION_POLL_INTERVAL", 2))
+
+# Seconds without a progress update before a running job is considered abandoned and re-claimed
+INGESTION_STALE_AFTER = float(os.getenv("INGESTION_STALE_AFTER", 600))
+
+# Seconds between heartbeats while a job runs, so a long window never looks abandoned
+INGESTION_HEARTBEAT_INTERVAL = float(os.getenv("INGESTION_HEARTBEAT_INTERVAL", 60))
+
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", 3))
+
+PROGRESS_COLUMNS = ("pages_extracted", "chunks_embedded", "rows_written", "error")
+
+_threads: List[threading.Thread] = []
+_stop = threading.Event()
+
+def update_progress(job_id: uuid.UUID, stage: str, **counters) -> None:
+    """Record a job's stage and progress counters; also serves as its heartbeat."""
+    assignments = "".join(f"{name} = %({name})s, " for name in counters if name in PROGRESS_COLUMNS)
+    IngestionJob.sql(
+        f"UPDATE ingestion_jobs SET stage = %(stage)s, {assignments}updated_at = %(now)s WHERE id = %(job_id)s",
+        {**counters, "stage": stage, "now": datetime.now(), "job_id": str(job_id)}
+    )
+
+def heartbeat(job_id: uuid.UUID) -> None:
+    """Touch a running job's updated_at without changing its stage or counters."""
+    IngestionJob.sql(
+        "UPDATE ingestion_jobs SET updated_at = %(now)s WHERE id = %(job_id)s AND stage IN ('extracting', 'embedding', 'writing')",
+        {"now": datetime.now(), "job_id": str(job_id)}
+    )
+
+def _heartbeat_loop(job_id: uuid.UUID, finished: threading.Event) -> None:
+    while not finished.wait(INGESTION_HEARTBEAT_INTERVAL):
+        try:
+            heartbeat(job_id)
+        except Exception as e:
+            print(f"Could not send heartbeat for ingestion job {job_id}: {e}")
+
+def claim_next_job() -> Optional[IngestionJob]:
+    """Atomically claim the oldest queued (or abandoned) job, skipping rows other workers hold."""
+    now = datetime.now()
+    params = {
+        "now": now,
+        "stale_before": now - timedelta(seconds=INGESTION_STALE_AFTER),
+        "max_attempts": INGESTION_MAX_ATTEMPTS,
+    }
+
+    # Abandoned jobs that already used up their attempts are given up on
+    IngestionJob.sql(
+        """
+        UPDATE ingestion_jobs
+        SET stage = 'failed', error = 'Worker stopped responding', updated_at = %(now)s
+        WHERE stage IN ('extracting', 'embedding', 'writing')
+          AND updated_at < %(stale_before)s
+          AND attempts >= %(max_attempts)s
+        """,
+        params
+    )
+
+    results = IngestionJob.sql(
+        """
+        UPDATE ingestion_jobs
+        SET stage = 'extracting', attempts = attempts + 1, error = NULL, updated_at = %(now)s
+        WHERE id = (
+            SELECT id FROM ingestion_jobs
+            WHERE stage = 'queued'
+               OR (stage IN ('extracting', 'embedding', 'writing')
+                   AND updated_at < %(stale_before)s
+                   AND attempts < %(max_attempts)s)
+            ORDER BY created_at
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING *
+        """,
+        params
+    )
+
+    if not results:
+        return None
+
+    return IngestionJob(**results[0])
+
+def process_job(job: IngestionJob) -> None:
+    """Run one claimed job to completion, re-queueing it on failure while attempts remain."""
+    # Progress updates only come at window boundaries; the heartbeat covers the time in between
+    finished = threading.Event()
+    threading.Thread(target=_heartbeat_loop, args=(job.id, finished), name=f"ingestion-heartbeat-{job.id}", daemon=True).start()
+
+    try:
+        pdf_file = get_from_bucket(job.pdf_path)
+
+        # A retried job starts from a clean slate
+        Chunk.sql(
+            "DELETE FROM chunks WHERE document_id = %(document_id)s",
+            {"document_id": str(job.document_id)}
+        )
+
+        ingest_document(
+            job.document_id,
+            pdf_file,
+            progress=lambda stage, **counters: update_progress(job.id, stage, **counters)
+        )
+    except Exception as e:
+        print(f"Ingestion job {job.id} failed (attempt {job.attempts}): {e}")
+        stage = "queued" if job.attempts < INGESTION_MAX_ATTEMPTS else "failed"
+        update_progress(job.id, stage, error=str(e))
+    finally:
+        finished.set()
+
+def run_worker(stop: threading.Event) -> None:
+    """Claim and process jobs until stop is set."""
+    while not stop.is_set():
+        try:
+            job = claim_next_job()
+        except Exception as e:
+            print(f"Could not poll ingestion queue: {e}")
+            job = None
+
+        if job is None:
+            stop.wait(INGESTION_POLL_INTERVAL)
+            continue
+
+        try:
+            process_job(job)
+        except Exception as e:
+            # Recording the failure itself failed; the job is re-claimed once it goes stale
+            print(f"Could not finish ingestion job {job.id}: {e}")
+
+def start_workers(count: int = INGESTION_WORKERS) -> None:
+    """Start background worker threads in this process."""
+    _stop.clear()
+    for i in range(count):
+        thread = threading.Thread(target=run_worker, args=(_stop,), name=f"ingestion-worker-{i}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+def stop_workers() -> None:
+    """Ask background worker threads to exit after their current job."""
+    _stop.set()
+    _threads.clear()
@@ -0,0 +1,217 @@
+from typing import List, Dict, Tuple, Sequence, Iterable
+from collections import Counter
+from solar.cache import LRUCache
+from core.chunk import Chunk
+from core.document_index import DocumentIndex
+from core.retrieval import document_version
+import io
+import os
+import re
+import uuid
+import numpy as np
+
+# BM25 parameters
+BM25_K1 = float(os.getenv("BM25_K1", 1.2))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, as used for both chunks and queries."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class LexicalIndex:
+    """BM25 inverted index over one document's chunks, with postings in flat numpy arrays.
+
+    Postings of term t are docs[offsets[t]:offsets[t + 1]] (chunk positions) and the matching
+    term frequencies in tfs; chunk_ids maps positions back to chunk ids.
+    """
+
+    def __init__(self, chunk_ids: Sequence[uuid.UUID], terms: Sequence[str], offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray, doc_lengths: np.ndarray):
+        self.chunk_ids = list(chunk_ids)
+        self.terms = list(terms)
+        self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+
+        # Document version the index was loaded at (see retrieval.document_version)
+        self.version = None
+
+        # Per-term idf and per-chunk length normalization are fixed, so compute them once
+        n = len(self.chunk_ids)
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        average_length = float(doc_lengths.mean()) if n else 0.0
+        self.length_norm = (BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / (average_length or 1.0))).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the index."""
+        arrays = (self.offsets, self.docs, self.tfs, self.doc_lengths, self.idf, self.length_norm)
+        return sum(a.nbytes for a in arrays) + sum(len(t) + 100 for t in self.terms) + 100 * len(self.chunk_ids)
+
+    @classmethod
+    def build(cls, chunks: Iterable[Tuple[uuid.UUID, str]]) -> "LexicalIndex":
+        """Index (chunk id, text) pairs."""
+        builder = LexicalIndexBuilder()
+        for chunk_id, text in chunks:
+            builder.add(chunk_id, text)
+        return builder.build()
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk position for the query."""
+        scores = np.zeros(len(self.chunk_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocabulary.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            docs = self.docs[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            # A term has at most one posting per chunk, so plain fancy-index accumulation is safe
+            scores[docs] += self.idf[t] * tf * (BM25_K1 + 1) / (tf + self.length_norm[docs])
+        return scores
+
+    def top_k(self, query: str, top_k: int) -> List[Tuple[uuid.UUID, float]]:
+        """(chunk id, BM25 score) of the best matching chunks, best first; chunks without a match are left out."""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores)
+        if top_k < len(matched):
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.chunk_ids[i], float(scores[i])) for i in matched]
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a compressed .npz blob."""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            chunk_ids=np.frombuffer(b"".join(chunk_id.bytes for chunk_id in self.chunk_ids), dtype=np.uint8),
+            terms=np.frombuffer("\0".join(self.terms).encode("utf-8"), dtype=np.uint8),
+            offsets=self.offsets,
+            docs=self.docs,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LexicalIndex":
+        with np.load(io.BytesIO(data)) as arrays:
+            raw_ids = arrays["chunk_ids"].tobytes()
+            raw_terms = arrays["terms"].tobytes().decode("utf-8")
+            return cls(
+                chunk_ids=[uuid.UUID(bytes=raw_ids[i:i + 16]) for i in range(0, len(raw_ids), 16)],
+                terms=raw_terms.split("\0") if raw_terms else [],
+                offsets=arrays["offsets"],
+                docs=arrays["docs"],
+                tfs=arrays["tfs"],
+                doc_lengths=arrays["doc_lengths"],
+            )
+
+class LexicalIndexBuilder:
+    """Accumulates term counts chunk by chunk (e.g. while ingestion streams windows) and builds a LexicalIndex."""
+
+    def __init__(self):
+        self.chunk_ids: List[uuid.UUID] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+
+    def add(self, chunk_id: uuid.UUID, text: str) -> None:
+        position = len(self.chunk_ids)
+        tokens = tokenize(text)
+        self.chunk_ids.append(chunk_id)
+        self.doc_lengths.append(len(tokens))
+        for term, count in Counter(tokens).items():
+            self.postings.setdefault(term, []).append((position, count))
+
+    def build(self) -> LexicalIndex:
+        terms = sorted(self.postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        docs, tfs = [], []
+        for i, term in enumerate(terms):
+            postings = self.postings[term]
+            offsets[i + 1] = offsets[i] + len(postings)
+            docs.extend(position for position, _ in postings)
+            tfs.extend(min(count, 65535) for _, count in postings)
+        return LexicalIndex(
+            chunk_ids=self.chunk_ids,
+            terms=terms,
+            offsets=offsets,
+            docs=np.asarray(docs, dtype=np.int32),
+            tfs=np.asarray(tfs, dtype=np.uint16),
+            doc_lengths=np.asarray(self.doc_lengths, dtype=np.float32),
+        )
+
+# Per-process cache of lexical indexes, bounded by total bytes
+lexical_cache = LRUCache(
+    max_bytes=int(os.getenv("LEXICAL_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    sizeof=lambda index: index.nbytes,
+)
+
+def save_index(document_id: uuid.UUID, index: LexicalIndex) -> None:
+    """Persist a document's index, replacing any earlier one."""
+    DocumentIndex(document_id=document_id, chunk_count=len(index), data=index.to_bytes()).sync()
+
+def delete_index(document_id: uuid.UUID) -> None:
+    DocumentIndex.sql(
+        "DELETE FROM document_indexes WHERE document_id = %(document_id)s",
+        {"document_id": str(document_id)}
+    )
+
+def build_index(document_id: uuid.UUID) -> LexicalIndex:
+    """Index a document's chunks as they are in the database."""
+    rows = Chunk.select(
+        "id", "content",
+        where="document_id = %(document_id)s",
+        params={"document_id": str(document_id)}
+    )
+    return LexicalIndex.build((row["id"], row["content"]) for row in rows)
+
+def load_index(document_id: uuid.UUID, chunk_count: int) -> LexicalIndex:
+    """Read a document's stored index, rebuilding (and storing) it when it is missing or covers a different set of chunks.
+
+    Only called for settled documents (see get_index), so persisting here cannot race ingestion's own save_index.
+    """
+    results = DocumentIndex.select(
+        "chunk_count", "data",
+        where="document_id = %(document_id)s",
+        params={"document_id": str(document_id)}
+    )
+    if results and results[0]["chunk_count"] == chunk_count:
+        return LexicalIndex.from_bytes(bytes(results[0]["data"]))
+
+    # Documents ingested before indexes existed, or stored while chunks were still being written
+    index = build_index(document_id)
+    if len(index):
+        save_index(document_id, index)
+    return index
+
+def get_index(document_id: uuid.UUID) -> LexicalIndex:
+    """Get a document's index from the cache, loading it on a miss or when the document changed."""
+    # Empty or still-ingesting documents are indexed as they are, without caching or storing
+    version = document_version(document_id)
+    if version is None:
+        return build_index(document_id)
+
+    key = str(document_id)
+    def load() -> LexicalIndex:
+        index = load_index(document_id, version[0])
+        index.version = version
+        return index
+
+    index = lexical_cache.get_or_load(key, load)
+    if index.version != version:
+        # Cached before the document was re-ingested elsewhere
+        lexical_cache.pop(key)
+        index = lexical_cache.get_or_load(key, load)
+    return index
+
+def invalidate_document(document_id: uuid.UUID) -> None:
+    """Drop a document's cached index after its chunks changed."""
+    lexical_cache.pop(str(document_id))
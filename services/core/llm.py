@@ -0,0 +1,132 @@
+from typing import List, Dict, Optional, AsyncIterator
+from contextlib import asynccontextmanager
+from openai import AsyncOpenAI, APIConnectionError, RateLimitError, InternalServerError
+import asyncio
+import httpx
+import os
+import random
+
+# Shared async gateway for chat completions. Every chat path goes through complete() or stream(), so upstream
+# slowness queues on the semaphores below instead of holding worker threads for the length of a completion.
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+
+# Pooled connections to the LLM API per process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 100))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 20))
+
+# Seconds; the read timeout bounds the gap between streamed chunks, not the whole completion
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 60))
+
+# Completions in flight at once, across all models and per model
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 64))
+LLM_MAX_CONCURRENCY_PER_MODEL = int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", 32))
+
+# Retries of connection errors, timeouts, 429s and 5xx, with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", 8))
+
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)  # APITimeoutError is an APIConnectionError
+
+class _Gateway:
+    """Client and semaphores for one event loop (asyncio primitives can't be shared across loops)."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        timeout = httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+        self.client = AsyncOpenAI(
+            base_url=LLM_BASE_URL,
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            timeout=timeout,
+            max_retries=0,  # Retried here, outside the concurrency slots
+            http_client=httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            ),
+        )
+        self.global_limit = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        self.model_limits: Dict[str, asyncio.Semaphore] = {}
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        """Hold a global and a per-model concurrency slot."""
+        model_limit = self.model_limits.setdefault(model, asyncio.Semaphore(LLM_MAX_CONCURRENCY_PER_MODEL))
+        async with self.global_limit:
+            async with model_limit:
+                yield
+
+_gateway: Optional[_Gateway] = None
+
+def get_gateway() -> _Gateway:
+    """The gateway of the running event loop, created on first use."""
+    global _gateway
+    loop = asyncio.get_running_loop()
+    if _gateway is None or _gateway.loop is not loop:
+        _gateway = _Gateway(loop)
+    return _gateway
+
+async def aclose() -> None:
+    """Close pooled connections (call on application shutdown)."""
+    global _gateway
+    if _gateway is not None:
+        await _gateway.client.close()
+        _gateway = None
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+    # Honour the server's Retry-After on 429s when it asks for longer
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(LLM_RETRY_MAX_DELAY, max(delay, float(retry_after))) if retry_after else delay
+    except ValueError:
+        return delay
+
+async def complete(messages: List[Dict[str, str]], model: str, **params) -> str:
+    """Run a chat completion and return the message content."""
+    gateway = get_gateway()
+    attempt = 0
+    while True:
+        try:
+            async with gateway.slot(model):
+                response = await gateway.client.chat.completions.create(model=model, messages=messages, **params)
+            return response.choices[0].message.content
+        except RETRYABLE_ERRORS as e:
+            if attempt >= LLM_MAX_RETRIES:
+                raise
+            delay = _retry_delay(attempt, e)
+            print(f"LLM call to {model} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+        # Back off without holding a slot
+        await asyncio.sleep(delay)
+        attempt += 1
+
+async def stream(messages: List[Dict[str, str]], model: str, **params) -> AsyncIterator[str]:
+    """Stream a chat completion's text deltas. Failures are only retried before the first delta."""
+    gateway = get_gateway()
+    attempt = 0
+    started = False
+    while True:
+        try:
+            async with gateway.slot(model):
+                response = await gateway.client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+                try:
+                    async for event in response:
+                        if event.choices and event.choices[0].delta.content:
+                            started = True
+                            yield event.choices[0].delta.content
+                finally:
+                    # Also runs when the consumer stops early (e.g. the client disconnected)
+                    await response.close()
+            return
+        except RETRYABLE_ERRORS as e:
+            if started or attempt >= LLM_MAX_RETRIES:
+                raise
+            delay = _retry_delay(attempt, e)
+            print(f"LLM stream from {model} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+        attempt += 1
@@ -0,0 +1,141 @@
+from typing import List, Dict, Any, Union, IO, Iterator
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+import multiprocessing
+import io
+import os
+import signal
+import tempfile
+import threading
+
+# Process pool size for page extraction (defaults to one worker per core)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+
+# Pages handed to one worker task; PDFs this small are extracted as a single task
+PDF_EXTRACT_PAGES_PER_TASK = int(os.getenv("PDF_EXTRACT_PAGES_PER_TASK", 25))
+
+# Seconds one page may take before it is skipped
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", 30))
+
+# Shards queued or running at once for one PDF (bounds memory held by finished pages)
+PDF_EXTRACT_MAX_IN_FLIGHT = max(1, int(os.getenv("PDF_EXTRACT_MAX_IN_FLIGHT", 2 * PDF_EXTRACT_WORKERS)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+class PageTimeout(Exception):
+    pass
+
+@contextmanager
+def _page_deadline(seconds: float):
+    """Raise PageTimeout if the block runs longer than seconds (main thread of a process only)."""
+    if seconds <= 0 or threading.current_thread() is not threading.main_thread() or not hasattr(signal, "setitimer"):
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise PageTimeout()
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def extract_page_range(source: Union[str, IO[bytes]], start: int, stop: int, page_timeout: float) -> List[Dict[str, Any]]:
+    """Extract text for pages [start, stop) of a PDF file path or stream."""
+    import pypdf
+
+    pdf_reader = pypdf.PdfReader(source)
+    pages = []
+
+    for index in range(start, stop):
+        try:
+            with _page_deadline(page_timeout):
+                text = pdf_reader.pages[index].extract_text()
+        except PageTimeout:
+            print(f"Skipping PDF page {index + 1}: extraction took longer than {page_timeout}s")
+            continue
+
+        if text.strip():  # Only include pages with text
+            pages.append({
+                'page': index + 1,
+                'text': text.strip()
+            })
+
+    return pages
+
+def get_pool() -> ProcessPoolExecutor:
+    """Get or create the shared extraction process pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn keeps workers free of the API process's threads, sockets and DB pools
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, PDF_EXTRACT_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def iter_pages(pdf_bytes: bytes) -> Iterator[Dict[str, Any]]:
+    """Yield page texts in page order while page-range shards are extracted across the process pool.
+    
+    At most PDF_EXTRACT_MAX_IN_FLIGHT shards are queued or running at once, so a slow consumer
+    holds back extraction instead of letting finished pages pile up in memory.
+    """
+    import pypdf
+
+    page_count = len(pypdf.PdfReader(io.BytesIO(pdf_bytes)).pages)
+    if not page_count:
+        return
+
+    # Even a one-shard PDF goes through the pool: the per-page deadline only works on a
+    # process's main thread, so extracting inline on a worker thread would leave it unbounded.
+    # Workers read the PDF from disk rather than each receiving a pickled copy of the bytes
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_copy:
+        pdf_copy.write(pdf_bytes)
+        pdf_copy.flush()
+
+        pool = get_pool()
+        starts = iter(range(0, page_count, PDF_EXTRACT_PAGES_PER_TASK))
+        in_flight = deque()
+
+        def submit_next() -> None:
+            start = next(starts, None)
+            if start is not None:
+                in_flight.append(pool.submit(
+                    extract_page_range,
+                    pdf_copy.name,
+                    start,
+                    min(start + PDF_EXTRACT_PAGES_PER_TASK, page_count),
+                    PDF_PAGE_TIMEOUT,
+                ))
+
+        try:
+            for _ in range(PDF_EXTRACT_MAX_IN_FLIGHT):
+                submit_next()
+            while in_flight:
+                pages = in_flight.popleft().result()
+                submit_next()
+                yield from pages
+        except BrokenProcessPool:
+            _reset_pool()
+            raise
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+def extract_pages(pdf_bytes: bytes) -> List[Dict[str, Any]]:
+    """Extract text from every page, sharded by page range across the process pool, in page order."""
+    return list(iter_pages(pdf_bytes))
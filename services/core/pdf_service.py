@@ -1,38 +1,37 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Callable, Iterator
+from itertools import islice
 from solar.access import public
-from solar.media import MediaFile, save_to_bucket, generate_presigned_url
-from core.document import Document
+from solar.media import MediaFile, save_to_bucket, generate_presigned_url, generate_presigned_urls
+from core.document import Document, DocumentSummary, DocumentPage
 from core.chunk import Chunk
-from openai import OpenAI
+from core.ingestion_job import IngestionJob
+from core.embedding import embed_many
+from core.pdf_extract import iter_pages
+from core.retrieval import invalidate_document
+from core import vector_store, answer_cache, lexical_index
+from core.semantic_cache import semantic_cache
+from datetime import datetime
+import base64
+import json
 import os
 import re
 import uuid
 
-# Initialize OpenAI client for embeddings
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
+# Chunks embedded and inserted together while streaming a PDF in
+INGEST_WINDOW_CHUNKS = int(os.getenv("INGEST_WINDOW_CHUNKS", 256))
 
-def extract_text_from_pdf(pdf_file: MediaFile) -> List[Dict[str, any]]:
-    """Extract text from PDF and return list of pages with content."""
+# Documents per list_documents / list_documents_page page by default, and the most a caller can ask for
+DOCUMENT_PAGE_SIZE = int(os.getenv("DOCUMENT_PAGE_SIZE", 50))
+DOCUMENT_PAGE_MAX_SIZE = int(os.getenv("DOCUMENT_PAGE_MAX_SIZE", 200))
+
+# Optional fields of a DocumentSummary (id and created_at are always returned)
+DOCUMENT_SUMMARY_FIELDS = ("title", "pdf_path", "pdf_url", "is_public", "share_token")
+
+def extract_text_from_pdf(pdf_file: MediaFile) -> Iterator[Dict[str, any]]:
+    """Extract text from PDF, yielding pages with content in page order."""
     try:
-        import pypdf
-        import io
-        
-        # Create a PDF reader from bytes
-        pdf_reader = pypdf.PdfReader(io.BytesIO(pdf_file.bytes))
-        pages = []
-        
-        for page_num, page in enumerate(pdf_reader.pages, 1):
-            text = page.extract_text()
-            if text.strip():  # Only include pages with text
-                pages.append({
-                    'page': page_num,
-                    'text': text.strip()
-                })
-        
-        return pages
+        # Page ranges are extracted in parallel worker processes and merged in page order
+        yield from iter_pages(pdf_file.bytes)
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
@@ -71,40 +70,77 @@ def chunk_text(text: str, page_num: int, chunk_size: int = 3000) -> List[Dict[st
     
     return chunks
 
-def generate_embedding(text: str) -> List[float]:
-    """Generate embedding for text using hash-based approach as fallback."""
-    import hashlib
-    import struct
-    
-    # Fallback hash-based embedding since OpenRouter doesn't have embedding models readily available
-    dimension = 1536
-    embeddings = []
-    
-    # Normalize text
-    text = text.lower().strip()
-    
-    # Create embeddings by hashing text with different seeds
-    for i in range(dimension // 32):  # 32 values per hash
-        salted_text = f"{text}_{i}".encode('utf-8')
-        hash_obj = hashlib.sha256(salted_text)
-        hash_bytes = hash_obj.digest()
-        
-        # Convert bytes to floats
-        for j in range(0, len(hash_bytes), 8):
-            if len(embeddings) >= dimension:
+def ingest_document(document_id: uuid.UUID, pdf_file: MediaFile, progress: Optional[Callable[..., None]] = None) -> int:
+    """Extract, chunk, embed and store a document's chunks. Returns the number of chunks written.
+    
+    Pages stream through chunking, embedding and inserts in windows of INGEST_WINDOW_CHUNKS chunks,
+    so memory stays flat regardless of page count. progress, when given, is called as
+    progress(stage, **counters) after each step.
+    """
+    report = progress or (lambda stage, **counters: None)
+    counters = {"pages_extracted": 0, "chunks_embedded": 0, "rows_written": 0}
+    
+    def page_chunks():
+        for page_data in extract_text_from_pdf(pdf_file):
+            counters["pages_extracted"] += 1
+            yield from chunk_text(page_data['text'], page_data['page'])
+    
+    report("extracting", **counters)
+    chunks = page_chunks()
+    index = lexical_index.LexicalIndexBuilder()
+    try:
+        while True:
+            # Pulling the next window is what drives extraction forward
+            window = list(islice(chunks, INGEST_WINDOW_CHUNKS))
+            if not window:
                 break
-            chunk = hash_bytes[j:j+8]
-            if len(chunk) == 8:
-                # Convert to signed integer then normalize to [-1, 1]
-                val = struct.unpack('q', chunk)[0]
-                normalized = val / (2**63 - 1)  # Normalize to [-1, 1]
-                embeddings.append(float(normalized))
-    
-    # Pad or trim to exact dimension
-    while len(embeddings) < dimension:
-        embeddings.append(0.0)
-    
-    return embeddings[:dimension]
+            report("embedding", **counters)
+            
+            # Generate embeddings for the whole window in one batch
+            embeddings = embed_many([chunk_data['content'] for chunk_data in window])
+            chunk_objects = [
+                Chunk(
+                    document_id=document_id,
+                    content=chunk_data['content'],
+                    page=chunk_data['page'],
+                    embedding=embedding
+                )
+                for chunk_data, embedding in zip(window, embeddings)
+            ]
+            counters["chunks_embedded"] += len(chunk_objects)
+            report("writing", **counters)
+            
+            # Fresh rows are copied straight into the table, skipping the upsert merge
+            Chunk.sync_many(chunk_objects, insert_only=True)
+            
+            # Keep the pgvector column in step with the new rows
+            if vector_store.PGVECTOR_ENABLED:
+                vector_store.index_chunks(chunk_objects)
+            counters["rows_written"] += len(chunk_objects)
+            
+            # Term postings for BM25 retrieval, stored once every chunk is in
+            for chunk in chunk_objects:
+                index.add(chunk.id, chunk.content)
+        
+        lexical_index.save_index(document_id, index.build())
+    except Exception:
+        # Don't leave a partially ingested document behind
+        Chunk.sql(
+            "DELETE FROM chunks WHERE document_id = %(document_id)s",
+            {"document_id": str(document_id)}
+        )
+        lexical_index.delete_index(document_id)
+        raise
+    finally:
+        chunks.close()
+        # Drop any cached embedding matrix, lexical index and answers for this document
+        invalidate_document(document_id)
+        lexical_index.invalidate_document(document_id)
+        answer_cache.invalidate_document(document_id)
+        semantic_cache.invalidate_document(document_id)
+    
+    report("done", **counters)
+    return counters["rows_written"]
 
 @public
 def upload_and_process_pdf(pdf_file: MediaFile, title: str) -> Document:
@@ -120,30 +156,8 @@ def upload_and_process_pdf(pdf_file: MediaFile, title: str) -> Document:
         )
         document.sync()
         
-        # Extract text from PDF
-        pages = extract_text_from_pdf(pdf_file)
-        
-        # Process each page
-        all_chunks = []
-        for page_data in pages:
-            page_chunks = chunk_text(page_data['text'], page_data['page'])
-            all_chunks.extend(page_chunks)
-        
-        # Generate embeddings and save chunks
-        chunk_objects = []
-        for chunk_data in all_chunks:
-            embedding = generate_embedding(chunk_data['content'])
-            chunk = Chunk(
-                document_id=document.id,
-                content=chunk_data['content'],
-                page=chunk_data['page'],
-                embedding=embedding
-            )
-            chunk_objects.append(chunk)
-        
-        # Batch insert chunks
-        if chunk_objects:
-            Chunk.sync_many(chunk_objects)
+        # Extract, embed and store chunks
+        ingest_document(document.id, pdf_file)
         
         # Return document with presigned URL
         document.pdf_url = generate_presigned_url(pdf_path)
@@ -152,6 +166,43 @@ def upload_and_process_pdf(pdf_file: MediaFile, title: str) -> Document:
     except Exception as e:
         raise Exception(f"Error processing PDF: {str(e)}")
 
+@public
+def enqueue_pdf_ingestion(pdf_file: MediaFile, title: str) -> IngestionJob:
+    """Upload PDF file and queue it for background processing; poll get_ingestion_job for progress."""
+    try:
+        # Save PDF to bucket so any worker can pick it up
+        pdf_path = save_to_bucket(pdf_file)
+        
+        # Create document record
+        document = Document(
+            title=title,
+            pdf_path=pdf_path
+        )
+        document.sync()
+        
+        job = IngestionJob(
+            document_id=document.id,
+            pdf_path=pdf_path
+        )
+        job.sync()
+        return job
+        
+    except Exception as e:
+        raise Exception(f"Error queueing PDF: {str(e)}")
+
+@public
+def get_ingestion_job(job_id: uuid.UUID) -> IngestionJob:
+    """Get the stage and progress counters of an ingestion job."""
+    results = IngestionJob.sql(
+        "SELECT * FROM ingestion_jobs WHERE id = %(job_id)s",
+        {"job_id": str(job_id)}
+    )
+    
+    if not results:
+        raise Exception(f"Ingestion job with ID {job_id} not found")
+    
+    return IngestionJob(**results[0])
+
 @public
 def get_document(document_id: uuid.UUID) -> Document:
     """Get document by ID with presigned URL for PDF access."""
@@ -168,15 +219,76 @@ def get_document(document_id: uuid.UUID) -> Document:
     document.pdf_url = generate_presigned_url(document.pdf_path)
     return document
 
+def page_size(limit: Optional[int]) -> int:
+    """Requested page size clamped to [1, DOCUMENT_PAGE_MAX_SIZE], DOCUMENT_PAGE_SIZE when not given."""
+    return max(1, min(limit or DOCUMENT_PAGE_SIZE, DOCUMENT_PAGE_MAX_SIZE))
+
+@public
+def list_documents(cursor: Optional[uuid.UUID] = None, limit: Optional[int] = None) -> List[Document]:
+    """List documents newest first with presigned URLs, one page at a time; pass the last document's id as cursor for the next page."""
+    where, params = "", {"limit": page_size(limit)}
+    if cursor:
+        # Seek past the cursor document on the (created_at, id) index instead of counting an OFFSET
+        where = "WHERE (created_at, id) < (SELECT created_at, id FROM documents WHERE id = %(cursor)s)"
+        params["cursor"] = str(cursor)
+    results = Document.sql(f"SELECT * FROM documents {where} ORDER BY created_at DESC, id DESC LIMIT %(limit)s", params)
+    documents = [Document(**result) for result in results]
+    
+    # Sign in one batch; URLs signed recently are reused from the cache
+    urls = generate_presigned_urls([document.pdf_path for document in documents])
+    for document, url in zip(documents, urls):
+        document.pdf_url = url
+    
+    return documents
+
+def encode_cursor(created_at: datetime, document_id: uuid.UUID) -> str:
+    """Opaque page cursor pointing just past the given document."""
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), str(document_id)]).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        created_at, document_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), uuid.UUID(document_id)
+    except Exception:
+        raise Exception("Invalid cursor")
+
 @public
-def list_documents() -> List[Document]:
-    """List all documents with presigned URLs."""
-    results = Document.sql("SELECT * FROM documents ORDER BY created_at DESC")
-    documents = []
+def list_documents_page(cursor: Optional[str] = None, limit: Optional[int] = None, fields: Optional[List[str]] = None) -> DocumentPage:
+    """List documents newest first, one page at a time, with only the requested fields (all by default)."""
+    requested = list(DOCUMENT_SUMMARY_FIELDS if fields is None else fields)
+    unknown = sorted(set(requested) - set(DOCUMENT_SUMMARY_FIELDS))
+    if unknown:
+        raise Exception(f"Unknown document fields: {', '.join(unknown)}")
+    size = page_size(limit)
+    
+    # pdf_url isn't a column; it is signed from pdf_path
+    columns = ["id", "created_at"] + [field for field in requested if field != "pdf_url"]
+    if "pdf_url" in requested and "pdf_path" not in columns:
+        columns.append("pdf_path")
     
-    for result in results:
-        document = Document(**result)
-        document.pdf_url = generate_presigned_url(document.pdf_path)
-        documents.append(document)
+    # Seek past the cursor on the (created_at, id) index instead of counting an OFFSET
+    where, params = None, {}
+    if cursor:
+        created_at, document_id = decode_cursor(cursor)
+        where = "(created_at, id) < (%(created_at)s, %(document_id)s)"
+        params = {"created_at": created_at, "document_id": str(document_id)}
     
-    return documents
\ No newline at end of file
+    # One extra row tells whether another page follows
+    rows = Document.select(*columns, where=where, params=params, order_by="created_at DESC, id DESC", limit=size + 1)
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    
+    if "pdf_url" in requested:
+        urls = generate_presigned_urls([row["pdf_path"] for row in rows])
+        for row, url in zip(rows, urls):
+            row["pdf_url"] = url
+    
+    return DocumentPage(
+        documents=[
+            DocumentSummary(id=row["id"], created_at=row["created_at"], **{field: row[field] for field in requested})
+            for row in rows
+        ],
+        next_cursor=next_cursor
+    )
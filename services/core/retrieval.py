@@ -0,0 +1,153 @@
+from typing import List, Dict, Any, Tuple, Sequence, Optional
+from solar import decode_embeddings
+from solar.cache import LRUCache
+from core.chunk import Chunk, ChunkText, EMBEDDING_DIMENSION
+import os
+import sys
+import uuid
+import numpy as np
+
+# Rough per-row cost of the Python objects kept next to the matrix (dict, uuid, datetime)
+ROW_OVERHEAD_BYTES = 400
+
+class DocumentMatrix:
+    """A document's chunk embeddings packed into one contiguous float32 matrix."""
+
+    def __init__(self, document_id: uuid.UUID, rows: Sequence[Dict[str, Any]]):
+        self.document_id = document_id
+
+        # One (n_chunks, dimension) block decoded straight from the packed column;
+        # the metadata rows keep everything but the embedding
+        matrix = decode_embeddings([row["embedding"] for row in rows], EMBEDDING_DIMENSION)
+        self.matrix = np.ascontiguousarray(matrix)
+        self.rows = [{k: v for k, v in row.items() if k != "embedding"} for row in rows]
+
+        # Inverse row norms turn the matrix-vector product into cosine similarities
+        norms = np.linalg.norm(self.matrix, axis=1)
+        self.inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+        # Chunk id -> row index, built on first use (only hybrid retrieval needs it)
+        self._positions = None
+
+        # Document version the rows were read at (see document_version)
+        self.version = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by this matrix and its chunk metadata."""
+        content_bytes = sum(sys.getsizeof(row.get("content", "")) for row in self.rows)
+        return (
+            self.matrix.nbytes
+            + self.inverse_norms.nbytes
+            + content_bytes
+            + ROW_OVERHEAD_BYTES * len(self.rows)
+        )
+
+    def chunk(self, index: int) -> ChunkText:
+        """Build the embedding-free chunk model for one row of the matrix."""
+        return ChunkText(**self.rows[index])
+
+    def position(self, chunk_id: uuid.UUID) -> int:
+        """Row index of a chunk id, or -1 if the chunk isn't in the matrix."""
+        if self._positions is None:
+            self._positions = {str(row["id"]): i for i, row in enumerate(self.rows)}
+        return self._positions.get(str(chunk_id), -1)
+
+    def scores(self, query_embedding: Sequence[float]) -> np.ndarray:
+        """Cosine similarity of every row to the query."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return np.zeros(len(self.rows), dtype=np.float32)
+        return (self.matrix @ (query / query_norm)) * self.inverse_norms
+
+    def top_k(self, query_embedding: Sequence[float], top_k: int = 5) -> List[Tuple[int, float]]:
+        """Return (row index, cosine similarity) pairs for the best top_k rows, best first."""
+        if top_k <= 0 or not self.rows:
+            return []
+        return top_k_scores(self.scores(query_embedding), top_k)
+
+def top_k_scores(scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+    """(index, score) pairs of the top_k highest scores, best first."""
+    # Partial selection first, then only the k winners get sorted
+    if top_k < len(scores):
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(len(scores))
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    return [(int(i), float(scores[i])) for i in order]
+
+def normalize_scores(scores: np.ndarray) -> np.ndarray:
+    """Min-max scale scores to [0, 1] so differently scaled rankings can be added."""
+    if not len(scores):
+        return scores
+    low, high = float(scores.min()), float(scores.max())
+    if high <= low:
+        return np.zeros_like(scores) if high <= 0 else np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+# Per-process cache of document matrices, bounded by total bytes
+embedding_cache = LRUCache(
+    max_bytes=int(os.getenv("RETRIEVAL_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+    sizeof=lambda matrix: matrix.nbytes,
+)
+
+def document_version(document_id: uuid.UUID) -> Optional[Tuple[int, Any]]:
+    """(chunk count, newest chunk write) of a document, or None while it has no chunks or is being ingested.
+
+    Ingestion may run in another process (the dedicated worker or another replica), where the
+    invalidation hooks of this one never fire; comparing versions is what keeps cached copies honest.
+    """
+    results = Chunk.sql(
+        """
+        SELECT count(*) AS chunk_count, max(created_at) AS written_at,
+               EXISTS (
+                   SELECT 1 FROM ingestion_jobs
+                   WHERE document_id = %(document_id)s AND stage NOT IN ('done', 'failed')
+               ) AS ingesting
+        FROM chunks
+        WHERE document_id = %(document_id)s
+        """,
+        {"document_id": str(document_id)}
+    )
+    state = results[0]
+    if not state["chunk_count"] or state["ingesting"]:
+        return None
+    return (state["chunk_count"], state["written_at"])
+
+def load_document_matrix(document_id: uuid.UUID, version: Optional[Tuple[int, Any]] = None) -> DocumentMatrix:
+    """Read every chunk of a document from the database into a DocumentMatrix."""
+    results = Chunk.select(
+        "id", "document_id", "page", "content", "embedding",
+        where="document_id = %(document_id)s",
+        params={"document_id": str(document_id)}
+    )
+    matrix = DocumentMatrix(document_id, results or [])
+    matrix.version = version
+    return matrix
+
+def get_document_matrix(document_id: uuid.UUID) -> DocumentMatrix:
+    """Get a document's matrix from the cache, loading it on a miss or when the document changed."""
+    # Empty or still-ingesting documents are read as they are and never cached
+    version = document_version(document_id)
+    if version is None:
+        return load_document_matrix(document_id)
+
+    key = str(document_id)
+    def load() -> DocumentMatrix:
+        return load_document_matrix(document_id, version)
+
+    matrix = embedding_cache.get_or_load(key, load)
+    if matrix.version != version:
+        # Cached before the document was re-ingested elsewhere
+        embedding_cache.pop(key)
+        matrix = embedding_cache.get_or_load(key, load)
+    return matrix
+
+def invalidate_document(document_id: uuid.UUID) -> None:
+    """Drop a document's cached matrix after its chunks were written."""
+    embedding_cache.pop(str(document_id))
@@ -0,0 +1,191 @@
+from typing import Optional, Dict, Any, Sequence, List, Tuple
+from dataclasses import dataclass
+from solar.cache import LRUCache
+from core.chunk import EMBEDDING_DIMENSION
+from core.retrieval import document_version
+import os
+import random
+import threading
+import time
+import uuid
+import numpy as np
+
+# Minimum cosine similarity between two questions for one to reuse the other's answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+
+# Cached questions kept per document (least recently hit are dropped first) and documents kept per process
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", 128))
+SEMANTIC_CACHE_MAX_DOCUMENTS = int(os.getenv("SEMANTIC_CACHE_MAX_DOCUMENTS", 128))
+
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", 3600))
+
+# Fraction of hits that are re-checked against a fresh retrieval to estimate the false-hit rate
+SEMANTIC_CACHE_SAMPLE_RATE = float(os.getenv("SEMANTIC_CACHE_SAMPLE_RATE", 0.05))
+
+# A sampled hit is false when its chunks overlap the fresh retrieval's by less than this (Jaccard)
+SEMANTIC_CACHE_MIN_OVERLAP = float(os.getenv("SEMANTIC_CACHE_MIN_OVERLAP", 0.5))
+
+@dataclass
+class SemanticHit:
+    answer: str
+    similarity: float
+    chunk_ids: List[str]
+    citations: Dict[str, Any]  # core.chat_service.citations() of the chunks the answer was built on
+    sampled: bool  # Caller should verify this hit against a fresh retrieval before serving it
+
+class DocumentQuestions:
+    """Normalized question embeddings of one document in a float32 matrix that grows up to capacity."""
+
+    def __init__(self, capacity: int, version: Tuple[int, Any]):
+        self.capacity = capacity
+        self.version = version  # Document version the answers were built at (see retrieval.document_version)
+        self.matrix = np.zeros((min(capacity, 8), EMBEDDING_DIMENSION), dtype=np.float32)
+        self.entries: List[Dict[str, Any]] = []
+        self.last_used: List[float] = []
+        self.lock = threading.Lock()
+
+    def nearest(self, query: np.ndarray) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """(similarity, entry) of the most similar live question, if any."""
+        now = time.monotonic()
+        with self.lock:
+            live = np.array([entry["expires_at"] > now for entry in self.entries], dtype=bool)
+            if not live.any():
+                return None
+            scores = np.where(live, self.matrix[:len(self.entries)] @ query, -np.inf)
+            slot = int(np.argmax(scores))
+            self.last_used[slot] = now
+            return float(scores[slot]), self.entries[slot]
+
+    def add(self, query: np.ndarray, entry: Dict[str, Any], threshold: float) -> None:
+        """Store a question, replacing the most similar one instead when it clears the threshold."""
+        now = time.monotonic()
+        with self.lock:
+            expired = [i for i, e in enumerate(self.entries) if e["expires_at"] <= now]
+            scores = self.matrix[:len(self.entries)] @ query
+            if len(scores) and scores.max() >= threshold:
+                # Same question asked again: refresh its answer rather than adding a duplicate
+                slot = int(np.argmax(scores))
+            elif expired:
+                slot = expired[0]
+            elif len(self.entries) < self.capacity:
+                slot = len(self.entries)
+                self.entries.append(entry)
+                self.last_used.append(now)
+                if slot == len(self.matrix):
+                    grown = np.zeros((min(self.capacity, 2 * len(self.matrix)), EMBEDDING_DIMENSION), dtype=np.float32)
+                    grown[:slot] = self.matrix
+                    self.matrix = grown
+            else:
+                # Full: replace the least recently used question
+                slot = int(np.argmin(self.last_used))
+            self.matrix[slot] = query
+            self.entries[slot] = entry
+            self.last_used[slot] = now
+
+class SemanticCache:
+    """Per-document cache of answers looked up by question-embedding similarity."""
+
+    def __init__(self, threshold: float, capacity: int, max_documents: int, ttl: float, sample_rate: float):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl = ttl
+        self.sample_rate = sample_rate
+        self.documents = LRUCache(max_entries=max_documents)
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.sampled = 0
+        self.false_hits = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return query / norm if norm > 0 else None
+
+    def lookup(self, document_id: uuid.UUID, embedding: Sequence[float]) -> Optional[SemanticHit]:
+        """The cached answer of the most similar earlier question, when it clears the threshold."""
+        with self._lock:
+            self.lookups += 1
+
+        query = self._normalize(embedding)
+        questions = self.documents.get(str(document_id))
+        if query is None or questions is None:
+            return None
+
+        # Answers built on chunks that were re-ingested since (possibly by another process) are dropped
+        if questions.version != document_version(document_id):
+            self.documents.pop(str(document_id))
+            return None
+
+        nearest = questions.nearest(query)
+        if nearest is None:
+            return None
+
+        similarity, entry = nearest
+        if similarity < self.threshold:
+            return None
+
+        sampled = random.random() < self.sample_rate
+        with self._lock:
+            self.hits += 1
+            self.sampled += sampled
+        return SemanticHit(entry["answer"], similarity, entry["chunk_ids"], entry["citations"], sampled)
+
+    def verify(self, hit: SemanticHit, chunk_ids: Sequence[Any]) -> bool:
+        """Record whether a sampled hit's chunks agree with a fresh retrieval; False means don't serve it."""
+        cached, fresh = set(hit.chunk_ids), {str(chunk_id) for chunk_id in chunk_ids}
+        overlap = len(cached & fresh) / len(cached | fresh) if cached | fresh else 1.0
+        agrees = overlap >= SEMANTIC_CACHE_MIN_OVERLAP
+        if not agrees:
+            with self._lock:
+                self.false_hits += 1
+        return agrees
+
+    def store(self, document_id: uuid.UUID, embedding: Sequence[float], answer: str, chunk_ids: Sequence[Any], citations: Dict[str, Any]) -> None:
+        query = self._normalize(embedding)
+        if query is None or self.capacity <= 0:
+            return
+
+        # Nothing is cached for empty or still-ingesting documents
+        version = document_version(document_id)
+        if version is None:
+            return
+
+        key = str(document_id)
+        questions = self.documents.get_or_load(key, lambda: DocumentQuestions(self.capacity, version))
+        if questions.version != version:
+            self.documents.pop(key)
+            questions = self.documents.get_or_load(key, lambda: DocumentQuestions(self.capacity, version))
+        questions.add(query, {
+            "answer": answer,
+            "chunk_ids": [str(chunk_id) for chunk_id in chunk_ids],
+            "citations": citations,
+            "expires_at": time.monotonic() + self.ttl,
+        }, self.threshold)
+
+    def invalidate_document(self, document_id: uuid.UUID) -> None:
+        self.documents.pop(str(document_id))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": len(self.documents),
+                "threshold": self.threshold,
+                "capacity": self.capacity,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "sampled": self.sampled,
+                "false_hits": self.false_hits,
+                "false_hit_rate": self.false_hits / self.sampled if self.sampled else 0.0,
+            }
+
+semantic_cache = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    capacity=SEMANTIC_CACHE_CAPACITY,
+    max_documents=SEMANTIC_CACHE_MAX_DOCUMENTS,
+    ttl=SEMANTIC_CACHE_TTL,
+    sample_rate=SEMANTIC_CACHE_SAMPLE_RATE,
+)
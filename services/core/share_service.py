@@ -7,10 +7,10 @@ from core.chat_session import ChatSession
 from solar.access import public
 
 @public
-def create_shareable_link(document_id: UUID) -> Dict[str, str]:
+async def create_shareable_link(document_id: UUID) -> Dict[str, str]:
     """Create a shareable link for a document."""
     # Get the document
-    results = Document.sql(
+    results = await Document.async_sql(
         "SELECT * FROM documents WHERE id = %(document_id)s", 
         {"document_id": document_id}
     )
@@ -25,7 +25,7 @@ def create_shareable_link(document_id: UUID) -> Dict[str, str]:
         share_token = secrets.token_urlsafe(32)
         
         # Update document with share token and make it public
-        Document.sql(
+        await Document.async_sql(
             "UPDATE documents SET share_token = %(share_token)s, is_public = true WHERE id = %(document_id)s",
             {"share_token": share_token, "document_id": document_id}
         )
@@ -33,7 +33,7 @@ def create_shareable_link(document_id: UUID) -> Dict[str, str]:
         share_token = document.share_token
         
         # Ensure it's marked as public
-        Document.sql(
+        await Document.async_sql(
             "UPDATE documents SET is_public = true WHERE id = %(document_id)s",
             {"document_id": document_id}
         )
@@ -44,9 +44,9 @@ def create_shareable_link(document_id: UUID) -> Dict[str, str]:
     }
 
 @public
-def get_document_by_share_token(share_token: str) -> Optional[Document]:
+async def get_document_by_share_token(share_token: str) -> Optional[Document]:
     """Get a document by its share token."""
-    results = Document.sql(
+    results = await Document.async_sql(
         "SELECT * FROM documents WHERE share_token = %(share_token)s AND is_public = true", 
         {"share_token": share_token}
     )
@@ -57,7 +57,7 @@ def get_document_by_share_token(share_token: str) -> Optional[Document]:
     return Document(**results[0])
 
 @public
-def create_chat_session(document_id: UUID) -> ChatSession:
+async def create_chat_session(document_id: UUID) -> ChatSession:
     """Create a new chat session for a document."""
     session_token = secrets.token_urlsafe(32)
     
@@ -65,14 +65,14 @@ def create_chat_session(document_id: UUID) -> ChatSession:
         document_id=document_id,
         session_token=session_token
     )
-    session.sync()
+    await session.async_sync()
     
     return session
 
 @public
-def get_chat_session(session_token: str) -> Optional[ChatSession]:
+async def get_chat_session(session_token: str) -> Optional[ChatSession]:
     """Get a chat session by its token."""
-    results = ChatSession.sql(
+    results = await ChatSession.async_sql(
         "SELECT * FROM chat_sessions WHERE session_token = %(session_token)s", 
         {"session_token": session_token}
     )
@@ -83,19 +83,19 @@ def get_chat_session(session_token: str) -> Optional[ChatSession]:
     return ChatSession(**results[0])
 
 @public
-def update_chat_session_activity(session_token: str) -> None:
+async def update_chat_session_activity(session_token: str) -> None:
     """Update the last activity timestamp for a chat session."""
     from datetime import datetime
     
-    ChatSession.sql(
+    await ChatSession.async_sql(
         "UPDATE chat_sessions SET last_activity = %(now)s WHERE session_token = %(session_token)s",
         {"now": datetime.now(), "session_token": session_token}
     )
 
 @public
-def revoke_share_access(document_id: UUID) -> bool:
+async def revoke_share_access(document_id: UUID) -> bool:
     """Revoke public access to a document."""
-    Document.sql(
+    await Document.async_sql(
         "UPDATE documents SET is_public = false WHERE id = %(document_id)s",
         {"document_id": document_id}
     )
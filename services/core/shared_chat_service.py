@@ -1,40 +1,44 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from uuid import UUID
 from core.chat_session import ChatSession
 from core.document import Document
-from core.chunk import Chunk
+from core.embedding import generate_embedding
+from core.chat_service import search_similar_chunks, stream_answer, cached_answer_events, citations
+from core import answer_cache, llm, executors
+from core.context_builder import pack_context, CONTEXT_CANDIDATES
 # Note: We don't need to store chat messages for shared sessions
 from solar.access import public
-import openai
-import os
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=os.getenv("OPENROUTER_API_KEY"), base_url="https://openrouter.ai/api/v1")
+# Completion settings for shared chat (also part of the answer cache key)
+SHARED_CHAT_COMPLETION_PARAMS = {"model": "anthropic/claude-3.5-sonnet", "max_tokens": 1000, "temperature": 0.7}
 
-@public
-def chat_with_shared_document(session_token: str, message: str) -> Dict[str, Any]:
-    """Chat with a shared document using a session token."""
+def prepare_shared_chat(session_token: str, message: str) -> Tuple[Any, List[Any], List[Dict[str, str]]]:
+    """Validate the session and gather the document, context chunks and LLM messages for a question."""
     # Get the chat session
-    session_results = ChatSession.sql(
-        "SELECT * FROM chat_sessions WHERE session_token = %(session_token)s", 
-        {"session_token": session_token}
+    session_results = ChatSession.select(
+        "document_id",
+        where="session_token = %(session_token)s",
+        params={"session_token": session_token},
+        as_model=True
     )
     
     if not session_results:
         raise ValueError("Invalid session token")
     
-    session = ChatSession(**session_results[0])
+    session = session_results[0]
     
     # Get the document
-    doc_results = Document.sql(
-        "SELECT * FROM documents WHERE id = %(document_id)s AND is_public = true", 
-        {"document_id": session.document_id}
+    doc_results = Document.select(
+        "id", "title",
+        where="id = %(document_id)s AND is_public = true",
+        params={"document_id": session.document_id},
+        as_model=True
     )
     
     if not doc_results:
         raise ValueError("Document not found or not public")
     
-    document = Document(**doc_results[0])
+    document = doc_results[0]
     
     # Update session activity
     from datetime import datetime
@@ -43,16 +47,9 @@ def chat_with_shared_document(session_token: str, message: str) -> Dict[str, Any
         {"now": datetime.now(), "session_token": session_token}
     )
     
-    # Get relevant chunks for the document
-    chunk_results = Chunk.sql(
-        "SELECT * FROM chunks WHERE document_id = %(document_id)s ORDER BY page_number, chunk_index", 
-        {"document_id": session.document_id}
-    )
-    
-    chunks = [Chunk(**chunk) for chunk in chunk_results]
-    
-    # Find most relevant chunks (simple approach for now)
-    relevant_chunks = chunks[:5]  # Take first 5 chunks as context
+    # Get the chunks most similar to the question, through the same index and caches as the owner chat
+    # (packed into the context token budget)
+    relevant_chunks = pack_context(search_similar_chunks(generate_embedding(message), session.document_id, top_k=CONTEXT_CANDIDATES, query=message))
     context = "\n\n".join([chunk.content for chunk in relevant_chunks])
     
     # Create the prompt
@@ -65,19 +62,32 @@ User question: {message}
 
 Please provide a helpful answer based on the document content. If the information isn't in the provided content, say so."""
     
+    llm_messages = [
+        {"role": "system", "content": "You are a helpful AI assistant that answers questions about documents."},
+        {"role": "user", "content": prompt}
+    ]
+    return document, relevant_chunks, llm_messages
+
+@public
+async def chat_with_shared_document(session_token: str, message: str) -> Dict[str, Any]:
+    """Chat with a shared document using a session token."""
+    # Session checks and retrieval are blocking database and numpy work, so they run on the interactive executor lane
+    document, relevant_chunks, llm_messages = await executors.interactive.run(prepare_shared_chat, session_token, message)
+    
+    # Shared documents get the same few questions over and over
+    cache_key = answer_cache.answer_key(document.id, message, [chunk.id for chunk in relevant_chunks], **SHARED_CHAT_COMPLETION_PARAMS)
+    cached = await executors.interactive.run(answer_cache.get_answer, cache_key)
+    if cached is not None:
+        return {
+            "response": cached,
+            "session_token": session_token,
+            "document_title": document.title
+        }
+    
     try:
-        # Get response from OpenAI
-        response = client.chat.completions.create(
-            model="anthropic/claude-3.5-sonnet",
-            messages=[
-                {"role": "system", "content": "You are a helpful AI assistant that answers questions about documents."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.7
-        )
-        
-        ai_response = response.choices[0].message.content
+        # Get response from the LLM gateway
+        ai_response = await llm.complete(llm_messages, **SHARED_CHAT_COMPLETION_PARAMS)
+        await executors.interactive.run(answer_cache.store_answer, cache_key, ai_response)
         
         # Store the chat message (will implement storage later if needed)
         # For now, just return the response without storing chat history
@@ -96,19 +106,36 @@ Please provide a helpful answer based on the document content. If the informatio
             "document_title": document.title
         }
 
+@public
+async def stream_chat_with_shared_document(session_token: str, message: str) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming chat_with_shared_document: the session is checked now, the returned events carry citations and then the answer."""
+    document, relevant_chunks, llm_messages = await executors.interactive.run(prepare_shared_chat, session_token, message)
+    
+    cache_key = answer_cache.answer_key(document.id, message, [chunk.id for chunk in relevant_chunks], **SHARED_CHAT_COMPLETION_PARAMS)
+    cached = await executors.interactive.run(answer_cache.get_answer, cache_key)
+    if cached is not None:
+        return cached_answer_events(citations(relevant_chunks), cached)
+    
+    return stream_answer(
+        relevant_chunks,
+        llm_messages,
+        "I apologize, but I'm having trouble processing your question right now. Please try again.",
+        on_complete=lambda answer: answer_cache.store_answer(cache_key, answer),
+        **SHARED_CHAT_COMPLETION_PARAMS
+    )
+
 @public
 def get_shared_chat_history(session_token: str) -> List[Dict[str, Any]]:
     """Get chat history for a shared session."""
     # Verify session exists
-    session_results = ChatSession.sql(
-        "SELECT * FROM chat_sessions WHERE session_token = %(session_token)s", 
-        {"session_token": session_token}
+    session_results = ChatSession.select(
+        "id",
+        where="session_token = %(session_token)s",
+        params={"session_token": session_token}
     )
     
     if not session_results:
         return []
     
-    session = ChatSession(**session_results[0])
-    
     # For now, return empty history - can implement storage later if needed
     return []
\ No newline at end of file
@@ -0,0 +1,133 @@
+from typing import List, Dict, Any, Optional, Sequence
+from solar import decode_embeddings
+from core.chunk import Chunk, EMBEDDING_DIMENSION
+import os
+import uuid
+import numpy as np
+
+# "memory" ranks chunks in-process (core.retrieval); "pgvector" pushes ranking into Postgres
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "memory")
+PGVECTOR_ENABLED = RETRIEVAL_BACKEND == "pgvector"
+
+# Index type for the vector column: "hnsw" or "ivfflat"
+PGVECTOR_INDEX = os.getenv("PGVECTOR_INDEX", "hnsw")
+PGVECTOR_IVFFLAT_LISTS = int(os.getenv("PGVECTOR_IVFFLAT_LISTS", 100))
+
+# Per-document searches filter the table-wide ANN index after the fact. The index only hands back
+# hnsw.ef_search (or ivfflat.probes lists' worth of) candidates, so with many documents few or none
+# may belong to the one being searched. On pgvector >= 0.8 the scan keeps going until enough rows pass
+# the filter (iterative_scan); on older versions the candidate pool is widened instead, and searches
+# that still come back short are re-run as exact scans.
+PGVECTOR_EF_SEARCH = int(os.getenv("PGVECTOR_EF_SEARCH", 200))
+PGVECTOR_IVFFLAT_PROBES = int(os.getenv("PGVECTOR_IVFFLAT_PROBES", 10))
+ITERATIVE_SCAN_MIN_VERSION = (0, 8)
+
+_iterative_scan_supported: Optional[bool] = None
+
+def to_vector_literal(embedding: Sequence[float]) -> str:
+    """Format an embedding as a pgvector text literal."""
+    # numpy float32 scalars print their shortest round-tripping form
+    values = np.asarray(embedding, dtype=np.float32)
+    return "[" + ",".join(map(str, values)) + "]"
+
+def ensure_column() -> None:
+    """Create the pgvector extension and the vector column on chunks."""
+    Chunk.sql("CREATE EXTENSION IF NOT EXISTS vector")
+    Chunk.sql(f"ALTER TABLE chunks ADD COLUMN IF NOT EXISTS embedding_vector vector({EMBEDDING_DIMENSION})")
+    Chunk.sql("CREATE INDEX IF NOT EXISTS chunks_document_id_idx ON chunks (document_id)")
+
+def ensure_index() -> None:
+    """Create the ANN index on the vector column (build IVFFlat only after rows exist)."""
+    if PGVECTOR_INDEX == "ivfflat":
+        Chunk.sql(
+            "CREATE INDEX IF NOT EXISTS chunks_embedding_vector_idx ON chunks "
+            f"USING ivfflat (embedding_vector vector_cosine_ops) WITH (lists = {PGVECTOR_IVFFLAT_LISTS})"
+        )
+    else:
+        Chunk.sql(
+            "CREATE INDEX IF NOT EXISTS chunks_embedding_vector_idx ON chunks "
+            "USING hnsw (embedding_vector vector_cosine_ops)"
+        )
+
+def write_vectors(chunk_ids: Sequence[uuid.UUID], embeddings: Sequence[Sequence[float]]) -> None:
+    """Store embeddings in the vector column for the given chunk ids."""
+    if not chunk_ids:
+        return
+    
+    Chunk.sql(
+        """
+        UPDATE chunks AS c SET embedding_vector = v.embedding::vector
+        FROM unnest(%(ids)s::uuid[], %(embeddings)s::text[]) AS v(id, embedding)
+        WHERE c.id = v.id
+        """,
+        {
+            "ids": [str(chunk_id) for chunk_id in chunk_ids],
+            "embeddings": [to_vector_literal(embedding) for embedding in embeddings],
+        }
+    )
+
+def backfill(batch_size: int = 1000) -> int:
+    """Fill the vector column for rows written before it existed. Returns the number of rows updated."""
+    total = 0
+    while True:
+        rows = Chunk.sql(
+            "SELECT id, embedding FROM chunks WHERE embedding_vector IS NULL LIMIT %(batch_size)s",
+            {"batch_size": batch_size}
+        )
+        if not rows:
+            return total
+        
+        embeddings = decode_embeddings([row["embedding"] for row in rows], EMBEDDING_DIMENSION)
+        write_vectors([row["id"] for row in rows], embeddings)
+        total += len(rows)
+
+def index_chunks(chunks: Sequence[Chunk]) -> None:
+    """Copy freshly written chunks' embeddings into the vector column."""
+    write_vectors([chunk.id for chunk in chunks], [chunk.vector for chunk in chunks])
+
+def iterative_scan_supported() -> bool:
+    """Whether the installed pgvector (>= 0.8) supports iterative index scans; checked once per process."""
+    global _iterative_scan_supported
+    if _iterative_scan_supported is None:
+        rows = Chunk.sql("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        version = tuple(int(part) for part in rows[0]["extversion"].split(".")[:2]) if rows else (0, 0)
+        _iterative_scan_supported = version >= ITERATIVE_SCAN_MIN_VERSION
+    return _iterative_scan_supported
+
+def filtered_scan_settings() -> Dict[str, Any]:
+    """Index settings for an ANN search restricted to one document."""
+    prefix = "ivfflat" if PGVECTOR_INDEX == "ivfflat" else "hnsw"
+    settings = {"ivfflat.probes": PGVECTOR_IVFFLAT_PROBES} if prefix == "ivfflat" else {"hnsw.ef_search": PGVECTOR_EF_SEARCH}
+    if iterative_scan_supported():
+        # relaxed_order may return rows slightly out of order; search() re-sorts them
+        settings[f"{prefix}.iterative_scan"] = "relaxed_order"
+    return settings
+
+def search(query_embedding: Sequence[float], document_id: Optional[uuid.UUID] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+    """Return the top_k chunk rows (without embeddings) by cosine distance, within one document or across all of them."""
+    params = {"query": to_vector_literal(query_embedding), "top_k": top_k}
+    where = ""
+    if document_id is not None:
+        where = "WHERE document_id = %(document_id)s"
+        params["document_id"] = str(document_id)
+    
+    statement = f"""
+        SELECT id, document_id, content, page, 1 - distance AS similarity
+        FROM (
+            SELECT id, document_id, content, page, embedding_vector <=> %(query)s::vector AS distance
+            FROM chunks
+            {where}
+            ORDER BY embedding_vector <=> %(query)s::vector
+            LIMIT %(top_k)s
+        ) AS candidates
+        ORDER BY distance
+        """
+    
+    if document_id is None:
+        return Chunk.sql(statement, params)
+    
+    rows = Chunk.sql(statement, params, local_settings=filtered_scan_settings())
+    if len(rows) < top_k and not iterative_scan_supported():
+        # The index ran out of candidates before enough matched the document: rank the document's rows exactly
+        rows = Chunk.sql(statement, params, local_settings={"enable_indexscan": "off"})
+    return rows
@@ -0,0 +1,6 @@
+from core.ingestion_worker import run_worker
+import threading
+
+# Dedicated ingestion worker process; run as many as needed alongside the API (set INGESTION_WORKERS=0 there)
+if __name__ == "__main__":
+    run_worker(threading.Event())
@@ -0,0 +1,7 @@
+from importlib import import_module
+import pkgutil
+import migrations
+
+for module_info in sorted(pkgutil.iter_modules(migrations.__path__), key=lambda m: m.name):
+    print(f"Applying {module_info.name}")
+    import_module(f"migrations.{module_info.name}").upgrade()
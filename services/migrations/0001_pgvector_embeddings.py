@@ -0,0 +1,12 @@
+from core import vector_store
+
+def upgrade():
+    """Add the pgvector column and ANN index on chunks, backfilling existing rows."""
+    if not vector_store.PGVECTOR_ENABLED:
+        print("RETRIEVAL_BACKEND is not pgvector, skipping")
+        return
+    
+    vector_store.ensure_column()
+    updated = vector_store.backfill()
+    print(f"Backfilled {updated} chunk vectors")
+    vector_store.ensure_index()
@@ -0,0 +1,46 @@
+from solar import encode_embedding
+from core.chunk import Chunk, EMBEDDING_CODEC
+
+BATCH_SIZE = 1000
+
+def upgrade():
+    """Convert chunks.embedding from float8[] to packed bytea (see solar.table.encode_embedding)."""
+    column = Chunk.sql(
+        """
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'chunks' AND column_name = 'embedding'
+        """
+    )
+    if not column or column[0]["data_type"] == "bytea":
+        print("chunks.embedding is already packed, skipping")
+        return
+    
+    # Pack into a side column first so the old data stays readable until the swap
+    Chunk.sql("ALTER TABLE chunks ADD COLUMN IF NOT EXISTS embedding_packed bytea")
+    
+    packed = 0
+    while True:
+        rows = Chunk.sql(
+            "SELECT id, embedding FROM chunks WHERE embedding_packed IS NULL LIMIT %(batch_size)s",
+            {"batch_size": BATCH_SIZE}
+        )
+        if not rows:
+            break
+        
+        Chunk.sql(
+            """
+            UPDATE chunks AS c SET embedding_packed = v.packed
+            FROM unnest(%(ids)s::uuid[], %(packed)s::bytea[]) AS v(id, packed)
+            WHERE c.id = v.id
+            """,
+            {
+                "ids": [str(row["id"]) for row in rows],
+                "packed": [encode_embedding(row["embedding"], EMBEDDING_CODEC) for row in rows],
+            }
+        )
+        packed += len(rows)
+    
+    print(f"Packed {packed} chunk embeddings as {EMBEDDING_CODEC}")
+    Chunk.sql("ALTER TABLE chunks DROP COLUMN embedding")
+    Chunk.sql("ALTER TABLE chunks RENAME COLUMN embedding_packed TO embedding")
+    Chunk.sql("ALTER TABLE chunks ALTER COLUMN embedding SET NOT NULL")
@@ -0,0 +1,6 @@
+from core import fulltext
+
+def upgrade():
+    """Add the generated tsvector column and GIN index on chunks for full-text retrieval."""
+    fulltext.ensure_column()
+    fulltext.ensure_index()
@@ -0,0 +1,5 @@
+from core.document import Document
+
+def upgrade():
+    """Index documents on (created_at, id) so list_documents_page pages are index seeks."""
+    Document.sql("CREATE INDEX IF NOT EXISTS documents_created_at_id_idx ON documents (created_at DESC, id DESC)")
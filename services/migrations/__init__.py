@@ -0,0 +1 @@
+"""Idempotent schema migrations, applied in filename order by migrate.py."""
@@ -1,4 +1,4 @@
-from .table import Table, ColumnDetails
+from .table import Table, ColumnDetails, encode_embedding, decode_embedding, decode_embeddings
 from .access import authenticated, User, public
 
-__all__ = [Table, ColumnDetails, authenticated, User, public]
+__all__ = [Table, ColumnDetails, encode_embedding, decode_embedding, decode_embeddings, authenticated, User, public]
@@ -58,6 +58,22 @@ class Config:
                 self._throw_if_missing(True, s3_dict[key], key)
         return s3_dict
 
+    def presigned_url_settings(self) -> Dict[str, float]:
+        """Get the presigned URL cache settings, with defaults."""
+        return {
+            "reuse_fraction": float(os.getenv("PRESIGNED_URL_REUSE_FRACTION", 0.5)),
+            "cache_max_entries": int(os.getenv("PRESIGNED_URL_CACHE_MAX_ENTRIES", 10000)),
+        }
+
+    def s3_credential_settings(self) -> Dict[str, float]:
+        """Get the S3 temporary credential refresh settings, with defaults."""
+        return {
+            "refresh_ahead": float(os.getenv("S3_CREDENTIALS_REFRESH_AHEAD", 1200)),
+            "refresh_ahead_fraction": float(os.getenv("S3_CREDENTIALS_REFRESH_AHEAD_FRACTION", 0.5)),
+            "retry_delay": float(os.getenv("S3_CREDENTIALS_RETRY_DELAY", 30)),
+            "timeout": float(os.getenv("S3_CREDENTIALS_TIMEOUT", 10)),
+        }
+
     def router_base_url(self, throw_if_missing: bool = True) -> Optional[str]:
         """Get the base URL for the Solar back-end service router."""
         router_base_url_val = os.getenv("ROUTER_BASE_URL")
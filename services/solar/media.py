@@ -1,13 +1,59 @@
 import requests
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List, Sequence, Dict
+from botocore.credentials import CredentialProvider, RefreshableCredentials
 from .config import config
+from .cache import LRUCache
+import botocore.session
 import datetime
+import threading
 import boto3
 import uuid
 
 
+# A presigned URL is handed out again until this fraction of its lifetime has passed,
+# so every URL a client receives still has the rest of its lifetime left
+_presigned_url_settings = config.presigned_url_settings()
+PRESIGNED_URL_REUSE_FRACTION = _presigned_url_settings["reuse_fraction"]
+PRESIGNED_URL_CACHE_MAX_ENTRIES = _presigned_url_settings["cache_max_entries"]
+
+# Seconds before expiry the background thread fetches new credentials. Keep this above
+# botocore's 15 minute advisory window so the client always finds fresh credentials waiting.
+# Short-lived credentials are renewed once this fraction of their lifetime is left instead
+_credential_settings = config.s3_credential_settings()
+S3_CREDENTIALS_REFRESH_AHEAD = _credential_settings["refresh_ahead"]
+S3_CREDENTIALS_REFRESH_AHEAD_FRACTION = _credential_settings["refresh_ahead_fraction"]
+S3_CREDENTIALS_RETRY_DELAY = _credential_settings["retry_delay"]
+S3_CREDENTIALS_TIMEOUT = _credential_settings["timeout"]
+
+# Credentials with less than this many seconds left are fetched inline (botocore's mandatory refresh window)
+S3_CREDENTIALS_MIN_REMAINING = 10 * 60
+
+presigned_url_cache = LRUCache(max_entries=PRESIGNED_URL_CACHE_MAX_ENTRIES)
+
+
+class _SolarCredentialProvider(CredentialProvider):
+    """Hands botocore's credential resolver the S3Client's refreshable credentials."""
+
+    METHOD = "solar-s3-credentials"
+    CANONICAL_NAME = "SolarS3"
+
+    def __init__(self, credentials: RefreshableCredentials):
+        super().__init__()
+        self._credentials = credentials
+
+    def load(self) -> RefreshableCredentials:
+        return self._credentials
+
+
 class S3Client:
+    """One boto3 S3 client whose temporary credentials are renewed in the background.
+
+    The client is built once and keeps its connection pool. botocore swaps in new credentials
+    through RefreshableCredentials, which asks credential_metadata() for them; a daemon thread
+    fetches them ahead of expiry, so that call normally returns without a network round trip.
+    """
+
     def __init__(self):
         self.s3_client_keys = config.s3_client_keys()
         self.api_url = self.s3_client_keys["api_url"]
@@ -16,19 +62,22 @@ class S3Client:
         self.api_key = self.s3_client_keys["api_key"]
         self.aws_region = self.s3_client_keys["aws_region"]
         self.aws_bucket_name = self.s3_client_keys["aws_bucket_name"]
-        self.expiration = None
+        self.expiration = None  # Expiry of the credentials the client is signing with
         self.s3_client = None
 
+        # Guards credential fetches (one at a time, shared by every waiting thread) and client creation
+        self._lock = threading.Lock()
+        self._metadata: Optional[Dict[str, str]] = None
+        self._metadata_expiration: Optional[datetime.datetime] = None
+        self._metadata_lifetime = 0.0  # Seconds the current credentials were valid for when fetched
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
     def get_base_path(self) -> str:
         return f"{self.org_id}/{self.project_id}"
 
-    def refresh_client_if_expired(self):
-        if (
-            self.s3_client is not None
-            and self.expiration is not None
-            and self.expiration > datetime.datetime.now(datetime.timezone.utc)
-        ):
-            return
+    def _fetch_credentials(self) -> None:
+        """Fetch new temporary credentials from the router (call with the lock held)."""
         response = requests.post(
             f"{self.api_url}/aws/get-s3-credentials",
             json={"orgId": self.org_id, "projectId": self.project_id},
@@ -36,22 +85,84 @@ class S3Client:
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json",
             },
+            timeout=S3_CREDENTIALS_TIMEOUT,
         )
         if response.status_code != 200:
             raise Exception("Failed to refresh credentials")
         credentials = response.json()
-        client = boto3.client(
-            "s3",
-            aws_access_key_id=credentials["accessKeyId"],
-            aws_secret_access_key=credentials["secretAccessKey"],
-            aws_session_token=credentials["sessionToken"],
-            region_name=self.aws_region,
-            config=boto3.session.Config(signature_version="s3v4"),
-        )
-        self.expiration = datetime.datetime.fromisoformat(
+        self._metadata_expiration = datetime.datetime.fromisoformat(
             credentials["expiration"].replace("Z", "+00:00")
         )
-        self.s3_client = client
+        self._metadata = {
+            "access_key": credentials["accessKeyId"],
+            "secret_key": credentials["secretAccessKey"],
+            "token": credentials["sessionToken"],
+            "expiry_time": self._metadata_expiration.isoformat(),
+        }
+        self._metadata_lifetime = self._seconds_left()
+
+    def _seconds_left(self) -> float:
+        if self._metadata_expiration is None:
+            return 0.0
+        return (self._metadata_expiration - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+
+    def credential_metadata(self) -> Dict[str, str]:
+        """Newest credentials in botocore's format; only fetches inline if the background refresh fell behind."""
+        with self._lock:
+            if self._seconds_left() <= S3_CREDENTIALS_MIN_REMAINING:
+                self._fetch_credentials()
+            self.expiration = self._metadata_expiration
+            return self._metadata
+
+    def refresh(self) -> None:
+        """Fetch new credentials now; the client picks them up as its current ones near expiry."""
+        with self._lock:
+            self._fetch_credentials()
+
+    def _refresh_delay(self) -> float:
+        """Seconds until the current credentials are due for a background refresh."""
+        lead = min(S3_CREDENTIALS_REFRESH_AHEAD, self._metadata_lifetime * S3_CREDENTIALS_REFRESH_AHEAD_FRACTION)
+        return self._seconds_left() - lead
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(max(self._refresh_delay(), S3_CREDENTIALS_RETRY_DELAY)):
+            if self._refresh_delay() > 0:
+                # Already renewed inline by credential_metadata()
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                # Retried after S3_CREDENTIALS_RETRY_DELAY; the current credentials stay in use meanwhile
+                print(f"S3 credential refresh failed: {e}")
+
+    def refresh_client_if_expired(self):
+        """Create the client and start the background refresh on first use."""
+        if self.s3_client is not None:
+            return
+        with self._lock:
+            if self.s3_client is not None:
+                return
+            self._fetch_credentials()
+            self.expiration = self._metadata_expiration
+            credentials = RefreshableCredentials.create_from_metadata(
+                metadata=self._metadata,
+                refresh_using=self.credential_metadata,
+                method=_SolarCredentialProvider.METHOD,
+            )
+            # Our provider goes first in the resolver chain, so the client never falls back to env/instance credentials
+            session = botocore.session.get_session()
+            session.get_component("credential_provider").insert_before("env", _SolarCredentialProvider(credentials))
+            self.s3_client = boto3.Session(botocore_session=session).client(
+                "s3",
+                region_name=self.aws_region,
+                config=boto3.session.Config(signature_version="s3v4"),
+            )
+            self._refresher = threading.Thread(target=self._refresh_loop, name="s3-credential-refresh", daemon=True)
+            self._refresher.start()
+
+    def close(self) -> None:
+        """Stop the background refresh."""
+        self._stop.set()
 
 
 s3_client = None
@@ -63,13 +174,24 @@ class MediaFile(BaseModel):
     bytes: bytes
 
 
+_client_lock = threading.Lock()
+
+
 def get_client():
     global s3_client
     if s3_client is None:
-        s3_client = S3Client()
+        with _client_lock:
+            if s3_client is None:
+                s3_client = S3Client()
     return s3_client
 
 
+def close_client():
+    """Stop the S3 client's background credential refresh (call on application shutdown)."""
+    if s3_client is not None:
+        s3_client.close()
+
+
 def save_to_bucket(media_file: MediaFile, file_path: Optional[str] = None):
     client = get_client()
     client.refresh_client_if_expired()
@@ -91,6 +213,7 @@ def delete_from_bucket(path: str):
         Bucket=client.aws_bucket_name,
         Key=path,
     )
+    presigned_url_cache.pop_matching(lambda key: key[0] == path)
 
 
 def get_from_bucket(path: str) -> MediaFile:
@@ -112,10 +235,34 @@ def get_from_bucket(path: str) -> MediaFile:
 
 
 def generate_presigned_url(path: str, expires_in: int = 3600) -> str:
+    return generate_presigned_urls([path], expires_in)[0]
+
+
+def generate_presigned_urls(paths: Sequence[str], expires_in: int = 3600) -> List[str]:
+    """Presigned GET URLs for many objects, reusing cached URLs and signing only the misses."""
+    urls = [presigned_url_cache.get((path, expires_in)) for path in paths]
+    missing = [i for i, url in enumerate(urls) if url is None]
+    if not missing:
+        return urls
+
+    # One credential check for the whole batch; signing itself is local
     client = get_client()
     client.refresh_client_if_expired()
-    return client.s3_client.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": client.aws_bucket_name, "Key": path},
-        ExpiresIn=expires_in,
-    )
+
+    # URLs signed with temporary credentials stop working when the credentials expire
+    lifetime = expires_in
+    if client.expiration is not None:
+        remaining = (client.expiration - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+        lifetime = min(lifetime, remaining)
+    ttl = lifetime * PRESIGNED_URL_REUSE_FRACTION
+
+    for i in missing:
+        path = paths[i]
+        urls[i] = client.s3_client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": client.aws_bucket_name, "Key": path},
+            ExpiresIn=expires_in,
+        )
+        if ttl > 0:
+            presigned_url_cache.set((path, expires_in), urls[i], ttl=ttl)
+    return urls
@@ -10,16 +10,18 @@
 ######################################################################################################################
 
 
-from typing import Dict, Any, Optional
-from pydantic import BaseModel, Field
+from typing import Dict, Any, Optional, Sequence, List, Callable, Type, Tuple
+from pydantic import BaseModel, Field, create_model
 
 from psycopg.rows import dict_row
-from psycopg_pool import ConnectionPool
-from psycopg import Connection, Error as PsycopgError
+from psycopg_pool import ConnectionPool, AsyncConnectionPool
+from psycopg import Connection, AsyncConnection, Error as PsycopgError
 from psycopg.types.json import Jsonb
 
 from .config import config
 
+import numpy as np
+import asyncio
 import logging
 import time
 
@@ -34,6 +36,9 @@ DEFAULT_RECONNECT_TIMEOUT = 5  # seconds
 DEFAULT_MAX_RETRIES = 3
 
 _pool = None
+_async_pool = None
+_async_pool_lock = None
+_projections: Dict[Tuple[type, Tuple[str, ...]], Type[BaseModel]] = {}
 _last_pool_check = 0
 _pool_check_interval = 300  # Check pool health every 5 minutes
 
@@ -116,6 +121,255 @@ def get_pool(reset: bool = False) -> Dict[str, ConnectionPool]:
     return _pool
 
 
+######################################################################################################################
+# Async Connection Pool
+######################################################################################################################
+# Lets async code (FastAPI routes) await queries directly instead of borrowing a thread for every blocking call. The
+# pool belongs to the event loop that first used it, so it is opened lazily and closed on application shutdown.
+
+DEFAULT_ASYNC_MAX_SIZE = 20
+
+
+async def _configure_async_connection(conn: AsyncConnection) -> None:
+    """Same search_path as SchemaConnection; the pool requires the connection to be left idle"""
+    await conn.execute("set search_path to auth, public")
+    await conn.commit()
+
+
+def _get_async_pool_lock() -> asyncio.Lock:
+    """Lock guarding the async pools, created inside the running event loop on first use"""
+    global _async_pool_lock
+
+    if _async_pool_lock is None:
+        _async_pool_lock = asyncio.Lock()
+    return _async_pool_lock
+
+
+async def get_async_pool(reset: bool = False) -> Dict[str, AsyncConnectionPool]:
+    """Get or open the async connection pools, one per Postgres key"""
+    global _async_pool
+
+    async with _get_async_pool_lock():
+        if _async_pool is not None and reset:
+            for pool in _async_pool.values():
+                await pool.close()
+            _async_pool = None
+
+        if _async_pool is None:
+            pools = {}
+            for pg_key, pg_conn_string in config.get_all_pg_connection_strings().items():
+                try:
+                    pool = AsyncConnectionPool(
+                        pg_conn_string,
+                        min_size=DEFAULT_MIN_SIZE,
+                        max_size=DEFAULT_ASYNC_MAX_SIZE,
+                        timeout=DEFAULT_TIMEOUT,
+                        kwargs={
+                            "row_factory": dict_row,
+                            "keepalives": 1,
+                            "keepalives_idle": DEFAULT_KEEPALIVE,
+                            "keepalives_interval": DEFAULT_KEEPALIVE,
+                            "keepalives_count": 3,
+                        },
+                        configure=_configure_async_connection,
+                        check=AsyncConnectionPool.check_connection,
+                        open=False,
+                    )
+                    await pool.open()
+                    pools[pg_key] = pool
+                    logger.info(f"Created new async connection pool for {pg_key}")
+                except Exception as e:
+                    logger.error(f"Failed to create async pool for {pg_key}: {str(e)}")
+                    raise
+            _async_pool = pools
+
+    return _async_pool
+
+
+async def close_async_pool() -> None:
+    """Close the async connection pools (call on application shutdown)"""
+    global _async_pool
+
+    async with _get_async_pool_lock():
+        if _async_pool is not None:
+            for pool in _async_pool.values():
+                await pool.close()
+            _async_pool = None
+
+
+######################################################################################################################
+# Embedding Codec
+######################################################################################################################
+# Embeddings are stored as bytea instead of float8[]: either little-endian float32 (4 bytes per dimension) or int8
+# values preceded by one float32 scale (1 byte per dimension + 4). The two layouts never have the same length for a
+# given dimension, so readers tell them apart without a header.
+
+EMBEDDING_CODECS = ("float32", "int8")
+
+
+def encode_embedding(values, codec: str = "float32") -> bytes:
+    """Pack an embedding into bytes using the given codec"""
+    vector = np.asarray(values, dtype=np.float32)
+    if codec == "float32":
+        return vector.astype("<f4", copy=False).tobytes()
+    if codec == "int8":
+        peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = peak / 127 if peak > 0 else 1.0
+        quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return np.array([scale], dtype="<f4").tobytes() + quantized.tobytes()
+    raise ValueError(f"Unknown embedding codec {codec!r}, expected one of {EMBEDDING_CODECS}")
+
+
+def decode_embeddings(blobs: Sequence[Any], dimension: int) -> np.ndarray:
+    """Decode packed embeddings into one (len(blobs), dimension) float32 array without per-element objects"""
+    float32_size = 4 * dimension
+    int8_size = 4 + dimension
+    float32_rows, int8_rows, list_rows = [], [], []
+    for i, blob in enumerate(blobs):
+        if isinstance(blob, (bytes, bytearray, memoryview)):
+            if len(blob) == float32_size:
+                float32_rows.append(i)
+            elif len(blob) == int8_size:
+                int8_rows.append(i)
+            else:
+                raise ValueError(f"Packed embedding of {len(blob)} bytes does not match dimension {dimension}")
+        else:
+            list_rows.append(i)  # rows still stored as float8[]
+
+    # Common case: one codec throughout, decoded straight from the joined buffer
+    if len(float32_rows) == len(blobs):
+        joined = b"".join(blobs)
+        return np.frombuffer(joined, dtype="<f4").astype(np.float32, copy=False).reshape(len(blobs), dimension)
+
+    out = np.empty((len(blobs), dimension), dtype=np.float32)
+    if float32_rows:
+        joined = b"".join(blobs[i] for i in float32_rows)
+        out[float32_rows] = np.frombuffer(joined, dtype="<f4").reshape(len(float32_rows), dimension)
+    if int8_rows:
+        layout = np.dtype([("scale", "<f4"), ("values", "i1", (dimension,))])
+        packed = np.frombuffer(b"".join(blobs[i] for i in int8_rows), dtype=layout)
+        out[int8_rows] = packed["values"].astype(np.float32) * packed["scale"][:, None]
+    if list_rows:
+        out[list_rows] = np.asarray([blobs[i] for i in list_rows], dtype=np.float32)
+    return out
+
+
+def decode_embedding(blob: Any, dimension: int) -> np.ndarray:
+    """Decode a single packed embedding into a float32 vector"""
+    return decode_embeddings([blob], dimension)[0]
+
+
+######################################################################################################################
+# Bulk Loading
+######################################################################################################################
+
+# Column types COPY may send in binary; anything else (arrays, timestamptz next to naive datetimes, extension
+# types like vector) makes the whole batch go through text COPY, which the server parses per column type
+BINARY_COPY_TYPES = {
+    "bool", "int2", "int4", "int8", "float4", "float8", "numeric", "text", "varchar", "bpchar",
+    "uuid", "bytea", "json", "jsonb", "date", "timestamp",
+}
+
+
+_COPY_TYPES_SQL = """
+    SELECT a.attname, t.typname
+    FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid
+    WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+"""
+
+
+def _binary_copy_types(type_rows: Sequence[Dict[str, Any]], columns: Sequence[str]) -> Optional[List[str]]:
+    """Postgres type names of columns when all of them can be copied in binary, otherwise None"""
+    types = {row["attname"]: row["typname"] for row in type_rows}
+    column_types = [types.get(col) for col in columns]
+    if all(typname in BINARY_COPY_TYPES for typname in column_types):
+        return column_types
+    return None
+
+
+def _copy_statements(
+    table_name: str, columns: Sequence[str], primary_key: str, insert_only: bool
+) -> Tuple[Optional[str], str, Optional[str]]:
+    """Staging table DDL (or None), the table to COPY into, and the merge statement (or None)"""
+    if insert_only:
+        return None, table_name, None
+
+    # Dropped with the transaction, so concurrent syncs on other connections never see it
+    staging = f"{table_name}_sync_staging"
+    columns_str = ", ".join(columns)
+    set_clause = ", ".join([f"{col} = EXCLUDED.{col}" for col in columns])
+    return (
+        f"CREATE TEMP TABLE {staging} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP",
+        staging,
+        f"""
+        INSERT INTO {table_name} ({columns_str})
+        SELECT {columns_str} FROM {staging}
+        ON CONFLICT ({primary_key}) DO UPDATE
+        SET {set_clause}
+        """,
+    )
+
+
+def _copy_rows(
+    conn: Connection,
+    table_name: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    primary_key: str,
+    insert_only: bool = False,
+) -> None:
+    """COPY rows into table_name, straight in when insert_only, otherwise through a staging table merge"""
+    create_staging, target, merge = _copy_statements(table_name, columns, primary_key, insert_only)
+
+    with conn.cursor() as cursor:
+        if create_staging:
+            cursor.execute(create_staging)
+
+        cursor.execute(_COPY_TYPES_SQL, [table_name])
+        column_types = _binary_copy_types(cursor.fetchall(), columns)
+        copy_format = "BINARY" if column_types is not None else "TEXT"
+        with cursor.copy(
+            f"COPY {target} ({', '.join(columns)}) FROM STDIN (FORMAT {copy_format})"
+        ) as copy:
+            if column_types is not None:
+                copy.set_types(column_types)
+            for row in rows:
+                copy.write_row(row)
+
+        if merge:
+            cursor.execute(merge)
+
+
+async def _acopy_rows(
+    conn: AsyncConnection,
+    table_name: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    primary_key: str,
+    insert_only: bool = False,
+) -> None:
+    """Async counterpart of _copy_rows"""
+    create_staging, target, merge = _copy_statements(table_name, columns, primary_key, insert_only)
+
+    async with conn.cursor() as cursor:
+        if create_staging:
+            await cursor.execute(create_staging)
+
+        await cursor.execute(_COPY_TYPES_SQL, [table_name])
+        column_types = _binary_copy_types(await cursor.fetchall(), columns)
+        copy_format = "BINARY" if column_types is not None else "TEXT"
+        async with cursor.copy(
+            f"COPY {target} ({', '.join(columns)}) FROM STDIN (FORMAT {copy_format})"
+        ) as copy:
+            if column_types is not None:
+                copy.set_types(column_types)
+            for row in rows:
+                await copy.write_row(row)
+
+        if merge:
+            await cursor.execute(merge)
+
+
 ######################################################################################################################
 # Table Class
 ######################################################################################################################
@@ -145,13 +399,8 @@ class Table(BaseModel):
         return f"{schema_name}.{tablename}"
 
     @classmethod
-    def sql(
-        cls,
-        sql_statement: str,
-        params: Dict[str, Any] | None = None,
-        schema_name: str = "public",
-        max_retries: int = 3,
-    ):
+    def _run(cls, operation: Callable[[Connection], Any], max_retries: int = 3):
+        """Run operation(conn) in one transaction on a pooled connection, retrying on database errors"""
         pg_key = config.get_pg_key_for_table(cls.__name__)
         pool = get_pool()
         retry_count = 0
@@ -170,19 +419,7 @@ class Table(BaseModel):
                     conn = current_pool.getconn()
 
                 with conn:
-                    with conn.cursor() as cursor:
-                        try:
-                            if schema_name != "public" and schema_name != "auth":
-                                cursor.execute(f"SET search_path TO {schema_name}")
-                            cursor.execute(sql_statement, params)
-                            if cursor.description is not None:
-                                return cursor.fetchall()
-                            else:
-                                return []
-                        finally:
-                            if schema_name != "public" and schema_name != "auth":
-                                cursor.execute("SET search_path TO public, auth")
-                return  # Success, exit the retry loop
+                    return operation(conn)
 
             except PsycopgError as e:
                 retry_count += 1
@@ -225,6 +462,152 @@ class Table(BaseModel):
                         except Exception:
                             pass
 
+    @classmethod
+    def sql(
+        cls,
+        sql_statement: str,
+        params: Dict[str, Any] | None = None,
+        schema_name: str = "public",
+        max_retries: int = 3,
+        local_settings: Dict[str, Any] | None = None,
+    ):
+        """Run a statement in its own transaction and return its rows.
+
+        local_settings are applied with SET LOCAL semantics (e.g. planner or index
+        parameters), so they only last for this statement's transaction.
+        """
+
+        def execute(conn: Connection):
+            with conn.cursor() as cursor:
+                try:
+                    if schema_name != "public" and schema_name != "auth":
+                        cursor.execute(f"SET search_path TO {schema_name}")
+                    for name, value in (local_settings or {}).items():
+                        cursor.execute("SELECT set_config(%s, %s, true)", [name, str(value)])
+                    cursor.execute(sql_statement, params)
+                    if cursor.description is not None:
+                        return cursor.fetchall()
+                    else:
+                        return []
+                finally:
+                    if schema_name != "public" and schema_name != "auth":
+                        cursor.execute("SET search_path TO public, auth")
+
+        return cls._run(execute, max_retries)
+
+    @classmethod
+    async def _arun(cls, operation: Callable[[AsyncConnection], Any], max_retries: int = 3):
+        """Async counterpart of _run: await operation(conn) in one transaction on a pooled async connection"""
+        pg_key = config.get_pg_key_for_table(cls.__name__)
+        retry_count = 0
+
+        while True:
+            pool = await get_async_pool()
+            try:
+                # Commits on success, rolls back on error and hands the connection back either way
+                async with pool[pg_key].connection() as conn:
+                    return await operation(conn)
+
+            except PsycopgError as e:
+                retry_count += 1
+                logger.warning(
+                    f"Database operation failed (attempt {retry_count}/{max_retries}): {str(e)}"
+                )
+                if retry_count >= max_retries:
+                    logger.error(
+                        f"Database operation failed after {max_retries} attempts"
+                    )
+                    raise
+
+                # Refresh the pool before retrying
+                await get_async_pool(reset=True)
+
+    @classmethod
+    async def async_sql(
+        cls,
+        sql_statement: str,
+        params: Dict[str, Any] | None = None,
+        schema_name: str = "public",
+        max_retries: int = 3,
+    ):
+        """Async counterpart of sql, for use from coroutines"""
+
+        async def execute(conn: AsyncConnection):
+            async with conn.cursor() as cursor:
+                try:
+                    if schema_name != "public" and schema_name != "auth":
+                        await cursor.execute(f"SET search_path TO {schema_name}")
+                    await cursor.execute(sql_statement, params)
+                    if cursor.description is not None:
+                        return await cursor.fetchall()
+                    else:
+                        return []
+                finally:
+                    if schema_name != "public" and schema_name != "auth":
+                        await cursor.execute("SET search_path TO public, auth")
+
+        return await cls._arun(execute, max_retries)
+
+    @classmethod
+    def projection(cls, *columns: str) -> Type[BaseModel]:
+        """Partial model with only the given columns, typed like the table's own fields (cached per column set)"""
+        key = (cls, columns)
+        if key not in _projections:
+            unknown = [col for col in columns if col not in cls.model_fields]
+            if unknown:
+                raise ValueError(f"{cls.__name__} has no columns {', '.join(unknown)}")
+            fields = {
+                col: (cls.model_fields[col].annotation, cls.model_fields[col])
+                for col in columns
+            }
+            _projections[key] = create_model(
+                f"{cls.__name__}Projection", __config__={"extra": "ignore"}, **fields
+            )
+        return _projections[key]
+
+    @classmethod
+    def select(
+        cls,
+        *columns: str,
+        where: Optional[str] = None,
+        params: Dict[str, Any] | None = None,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        as_model: bool = False,
+    ) -> List[Any]:
+        """
+        Fetch only the given columns instead of SELECT *.
+
+        Args:
+            columns: Column names to fetch (must be fields of the model)
+            where: Optional SQL condition, with %(name)s placeholders filled from params
+            params: Query parameters
+            order_by: Optional ORDER BY expression
+            limit: Optional row limit
+            as_model: Return projection() model instances instead of dict rows
+
+        Returns:
+            A list of dict rows, or of partial models when as_model is set
+        """
+        table_name = cls._get_sql_table_name()
+        if table_name is None:
+            raise ValueError("Cannot select without a table name defined")
+
+        model = cls.projection(*columns)  # Also validates the column names
+
+        sql_statement = f"SELECT {', '.join(columns)} FROM {table_name}"
+        if where:
+            sql_statement += f" WHERE {where}"
+        if order_by:
+            sql_statement += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql_statement += f" LIMIT {int(limit)}"
+
+        results = cls.sql(sql_statement, params) or []
+        if as_model:
+            return [model(**row) for row in results]
+        return results
+
     def _prepare_value(self, value):
         """Helper to recursively prepare values for database insertion"""
         if isinstance(value, list):
@@ -236,8 +619,18 @@ class Table(BaseModel):
             return Jsonb(value)
         return value
 
-    def sync(self):
-        """Sync the model to the database"""
+    @classmethod
+    def _primary_key(cls) -> str:
+        """Name of the primary key column"""
+        for field_name, field_info in cls.model_fields.items():
+            if field_info.json_schema_extra and field_info.json_schema_extra.get(
+                "primary_key", False
+            ):
+                return field_name
+        raise ValueError("Cannot sync without a primary key defined")
+
+    def _upsert_statement(self) -> Tuple[str, List[Any]]:
+        """INSERT ... ON CONFLICT DO UPDATE statement and values for this instance"""
         table_name = self.__class__._get_sql_table_name()
         if table_name is None:
             raise ValueError("Cannot sync without a table name defined")
@@ -245,23 +638,9 @@ class Table(BaseModel):
 
         # Get column names and values
         columns = list(data.keys())
-        values = []
-        for col in columns:
-            value = data[col]
-            field_info = self.__class__.model_fields[col]
-            values.append(self._prepare_value(value))
-
-        # Find primary key
-        primary_key = None
-        for field_name, field_info in self.__class__.model_fields.items():
-            if field_info.json_schema_extra and field_info.json_schema_extra.get(
-                "primary_key", False
-            ):
-                primary_key = field_name
-                break
+        values = [self._prepare_value(data[col]) for col in columns]
 
-        if not primary_key:
-            raise ValueError("Cannot sync without a primary key defined")
+        primary_key = self.__class__._primary_key()
 
         # Build the SQL statement
         columns_str = ", ".join(columns)
@@ -274,23 +653,21 @@ class Table(BaseModel):
             ON CONFLICT ({primary_key}) DO UPDATE
             SET {set_clause}
         """
-        self.__class__.sql(sql_statement, values)
+        return sql_statement, values
 
-    @classmethod
-    def sync_many(cls, objects, batch_size=1000):
-        """
-        Sync multiple model instances to the database in batched transactions.
-
-        Args:
-            objects: A single model instance or a list of model instances
-            batch_size: Maximum number of objects to sync in a single transaction
+    def sync(self):
+        """Sync the model to the database"""
+        sql_statement, values = self._upsert_statement()
+        self.__class__.sql(sql_statement, values)
 
-        Returns:
-            None
+    async def async_sync(self):
+        """Async counterpart of sync"""
+        sql_statement, values = self._upsert_statement()
+        await self.__class__.async_sql(sql_statement, values)
 
-        Raises:
-            ValueError: If no table name is defined or no primary key is found
-        """
+    @classmethod
+    def _sync_batches(cls, objects, batch_size: int):
+        """Yield (table name, columns, prepared rows, primary key) for each batch of objects"""
         # Handle single object case
         if not isinstance(objects, list):
             objects = [objects]
@@ -302,31 +679,17 @@ class Table(BaseModel):
         if table_name is None:
             raise ValueError("Cannot sync without a table name defined")
 
-        # Find primary key
-        primary_key = None
-        for field_name, field_info in cls.model_fields.items():
-            if field_info.json_schema_extra and field_info.json_schema_extra.get(
-                "primary_key", False
-            ):
-                primary_key = field_name
-                break
-
-        if not primary_key:
-            raise ValueError("Cannot sync without a primary key defined")
+        primary_key = cls._primary_key()
 
         # Process in batches
         for i in range(0, len(objects), batch_size):
             upper_idx = min(i + batch_size, len(objects))
             batch = objects[i:upper_idx]
 
-            # Build a SQL transaction for this batch
-            all_values = []
             columns = list(batch[0].model_dump().keys())
-            columns_str = ", ".join(columns)
-            placeholders = ", ".join(["%s"] * len(columns))
-            set_clause = ", ".join([f"{col} = EXCLUDED.{col}" for col in columns])
 
-            # Collect values for this batch
+            # Collect rows for this batch
+            rows = []
             for obj in batch:
                 if not isinstance(obj, cls):
                     raise TypeError(
@@ -334,20 +697,43 @@ class Table(BaseModel):
                     )
 
                 data = obj.model_dump()
-                row_values = []
-                for col in columns:
-                    value = data[col]
-                    row_values.append(obj._prepare_value(value))
-                all_values.extend(row_values)
-
-            # Build the SQL statement for this batch
-            values_placeholders = ", ".join([f"({placeholders})" for _ in batch])
-
-            sql_statement = f"""
-                INSERT INTO {table_name} ({columns_str})
-                VALUES {values_placeholders}
-                ON CONFLICT ({primary_key}) DO UPDATE
-                SET {set_clause}
-            """
-
-            cls.sql(sql_statement, all_values)
+                rows.append([obj._prepare_value(data[col]) for col in columns])
+
+            yield table_name, columns, rows, primary_key
+
+    @classmethod
+    def sync_many(cls, objects, batch_size=1000, insert_only=False):
+        """
+        Sync multiple model instances to the database in batched transactions.
+
+        Each batch is streamed with COPY FROM STDIN (binary when every column type allows it) into
+        a temporary staging table and merged with INSERT ... ON CONFLICT DO UPDATE.
+
+        Args:
+            objects: A single model instance or a list of model instances
+            batch_size: Maximum number of objects to sync in a single transaction
+            insert_only: The objects are all new rows, so COPY them straight into the table
+                and skip the staging merge (a primary key conflict fails the batch)
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If no table name is defined or no primary key is found
+        """
+        for table_name, columns, rows, primary_key in cls._sync_batches(objects, batch_size):
+            cls._run(
+                lambda conn: _copy_rows(
+                    conn, table_name, columns, rows, primary_key, insert_only
+                )
+            )
+
+    @classmethod
+    async def async_sync_many(cls, objects, batch_size=1000, insert_only=False):
+        """Async counterpart of sync_many"""
+        for table_name, columns, rows, primary_key in cls._sync_batches(objects, batch_size):
+            await cls._arun(
+                lambda conn: _acopy_rows(
+                    conn, table_name, columns, rows, primary_key, insert_only
+                )
+            )
@@ -0,0 +1,71 @@
+"""Regression tests pinning core.embedding to the original struct-based hash embedder.
+
+Stored chunk embeddings were produced by the original algorithm, so any drift here would
+silently break retrieval for documents ingested before the change.
+"""
+import hashlib
+import random
+import struct
+
+import numpy as np
+
+from core.chunk import EMBEDDING_DIMENSION
+from core.embedding import _scale, embed_many, generate_embedding
+
+
+def reference_embedding(text):
+    """The embedder as it was originally written in pdf_service."""
+    embeddings = []
+    text = text.lower().strip()
+    for i in range(EMBEDDING_DIMENSION // 32):
+        hash_bytes = hashlib.sha256(f"{text}_{i}".encode("utf-8")).digest()
+        for j in range(0, len(hash_bytes), 8):
+            if len(embeddings) >= EMBEDDING_DIMENSION:
+                break
+            chunk = hash_bytes[j:j + 8]
+            if len(chunk) == 8:
+                val = struct.unpack("q", chunk)[0]
+                embeddings.append(float(val / (2**63 - 1)))
+    while len(embeddings) < EMBEDDING_DIMENSION:
+        embeddings.append(0.0)
+    return embeddings[:EMBEDDING_DIMENSION]
+
+
+def sample_texts():
+    rng = random.Random(0)
+    alphabet = "abcdefghijklmnopqrstuvwxyz ÄéßΩ漢字 \n\t.,!?0123456789"
+    texts = ["", " ", "Hello World", "  padded text  ", "UPPER lower MiXeD", "page 12 (p. 5)"]
+    texts += ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 400))) for _ in range(300)]
+    return texts
+
+
+def test_generate_embedding_matches_reference():
+    for text in sample_texts():
+        assert generate_embedding(text) == reference_embedding(text)
+
+
+def test_embed_many_matches_reference():
+    texts = sample_texts()
+    batch = embed_many(texts)
+    assert batch.shape == (len(texts), EMBEDDING_DIMENSION)
+    assert batch.dtype == np.float64
+    for row, text in zip(batch, texts):
+        assert row.tolist() == reference_embedding(text)
+
+
+def test_embed_many_empty_batch():
+    assert embed_many([]).shape == (0, EMBEDDING_DIMENSION)
+
+
+def test_scale_matches_python_division_at_edges():
+    # Extremes, small magnitudes and values just around float64 rounding ties
+    values = [0, 1, -1, 2**63 - 1, -2**63, -2**63 + 1, 2**53, 2**53 + 1, -(2**53 + 1)]
+    for shift in range(54, 63):
+        base = 1 << shift
+        half_ulp = 1 << (shift - 53)
+        values += [base + half_ulp, base + half_ulp - 1, base + half_ulp + 1, base + 3 * half_ulp, -(base + half_ulp)]
+    rng = random.Random(1)
+    values += [rng.randint(-2**63, 2**63 - 1) for _ in range(10000)]
+
+    scaled = _scale(np.array(values, dtype=np.int64))
+    assert scaled.tolist() == [value / (2**63 - 1) for value in values]